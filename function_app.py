@@ -1,89 +1,273 @@
-import inspect
-import logging
-import json
-import azure.functions as func
-from philips_scorecard.build_scorecard import ScorecardGenerator
-from philips_scorecard.remediation_list_generator import FindingsDocumentGenerator
-from philips_scorecard.config.config_loader import ConfigLoader
-
-
-app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
-
-@app.route(route="func_build_philips_scorecard")
-def func_build_philips_scorecard(req: func.HttpRequest) -> func.HttpResponse:
-    """Process HTTP request to build Philips scorecard from provided JSON data.
-
-    Args:
-        req (func.HttpRequest): The HTTP request containing JSON data.
-
-    Returns:
-        func.HttpResponse: JSON response with scorecard data or error message.
-    """
-    logging.info('%s processed a request.', inspect.currentframe().f_code.co_name)
-
-    try:
-        # Parse JSON data from the request body
-        json_data = req.get_json()
-    except ValueError:
-        return func.HttpResponse(
-            "Invalid JSON",
-            status_code=400
-        )    
-
-    # Check if the required keys are present in the JSON data
-    if 'form_row_id' not in json_data or 'document_content' not in json_data:
-        return func.HttpResponse(
-            "Missing required keys: 'form_row_id' and/or 'document_content'",
-            status_code=400
-        )
-    # Convert the JSON object to a JSON string
-    json_request = json.dumps(json_data, indent=4)
-
-    json_response = ScorecardGenerator().build_scorecard(json_request)
-
-    return func.HttpResponse(
-        json.dumps(json_response),
-        mimetype="application/json",
-        status_code=200
-    )
-    
-
-@app.route(route="func_remediation_list_generator")
-async def func_remediation_list_generator(req: func.HttpRequest) -> func.HttpResponse:
-    """Process HTTP request to generate remediation list from provided Excel and template data.
-
-    Args:
-        req (func.HttpRequest): The HTTP request containing JSON data.
-
-    Returns:
-        func.HttpResponse: JSON response with generated document data or error message.
-    """
-    try:
-        # Parse JSON data from the request body
-        json_data = req.get_json()
-    except ValueError:
-        return func.HttpResponse(
-            "Invalid JSON",
-            status_code=400
-        )    
-
-    # Check if the required keys are present in the JSON data
-    if 'excel_content' not in json_data or 'output_template_content' not in json_data:
-        return func.HttpResponse(
-            "Missing required keys: 'excel_content' and/or 'output_template_content'",
-            status_code=400
-        )
-    # Convert the JSON object to a JSON string
-    json_request = json.dumps(json_data, indent=4)
-
-    azure_openai = ConfigLoader().initialize_openai_client()
-
-    findings_document_generator = FindingsDocumentGenerator(azure_openai)
-    # Call the async function
-    json_response = await findings_document_generator.build_docx_output_in_json_format(json_request)
-
-    return func.HttpResponse(
-        json.dumps(json_response),
-        mimetype="application/json",
-        status_code=200
-    )
\ No newline at end of file
+import inspect
+import logging
+import json
+import azure.functions as func
+# Only light modules are imported at load time. pandas, python-docx, pymssql
+# and openai are imported by the routes that use them, see scorecard_generator
+# and build_remediation_list, so indexing the app stays fast on a cold start.
+from philips_scorecard.utils.http_transport import (
+    JSON_MIMETYPE, is_binary_request, is_multipart_request, wants_binary_response, get_upload, get_parameter,
+    parse_flag, decode_base64, encode_base64, base64_json_body, http_response, docx_response
+)
+
+
+app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
+
+
+def scorecard_generator():
+    """A ScorecardGenerator, imported on first use. The scorecard path never loads openai."""
+    from philips_scorecard.build_scorecard import ScorecardGenerator
+    return ScorecardGenerator()
+
+
+@app.route(route="func_build_philips_scorecard")
+async def func_build_philips_scorecard(req: func.HttpRequest) -> func.HttpResponse:
+    """Process HTTP request to build Philips scorecard from provided JSON data.
+
+    The template can also be uploaded as the multipart file 'document_content'
+    or as the raw request body, with 'form_row_id' as a form field or query
+    parameter. The .docx bytes are returned instead of JSON for binary uploads
+    and when the Accept header asks for them.
+
+    The queries run on the database client's bounded thread pool, the rules and
+    the submission at the same time, while the template is decoded. The event
+    loop stays free for other requests meanwhile.
+
+    Args:
+        req (func.HttpRequest): The HTTP request containing JSON data.
+
+    Returns:
+        func.HttpResponse: JSON response with scorecard data, the .docx document or error message.
+    """
+    logging.info('%s processed a request.', inspect.currentframe().f_code.co_name)
+
+    if is_binary_request(req):
+        document_content = get_upload(req, 'document_content')
+        form_row_id = get_parameter(req, 'form_row_id')
+        if document_content is None or form_row_id is None:
+            return func.HttpResponse(
+                "Missing required 'document_content' upload and/or 'form_row_id' parameter",
+                status_code=400
+            )
+        if not form_row_id.isdigit():
+            return func.HttpResponse(
+                "'form_row_id' must be an integer id",
+                status_code=400
+            )
+        new_content = await scorecard_generator().build_scorecard_bytes_async(document_content, int(form_row_id))
+        return document_response(req, new_content, f"scorecard_{form_row_id}.docx")
+
+    try:
+        # Parse JSON data from the request body
+        json_data = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            "Invalid JSON",
+            status_code=400
+        )    
+
+    # Check if the required keys are present in the JSON data
+    if 'form_row_id' not in json_data or 'document_content' not in json_data:
+        return func.HttpResponse(
+            "Missing required keys: 'form_row_id' and/or 'document_content'",
+            status_code=400
+        )
+    # Base64 is decoded here at the edge, the generator works on bytes
+    try:
+        document_content = decode_base64(json_data['document_content'])
+        form_row_id = int(json_data['form_row_id'])
+    except (TypeError, ValueError) as e:
+        return func.HttpResponse(str(e), status_code=400)
+
+    new_content = await scorecard_generator().build_scorecard_bytes_async(document_content, form_row_id)
+    return document_response(req, new_content, f"scorecard_{form_row_id}.docx")
+
+
+def document_response(req: func.HttpRequest, content: bytes, filename: str) -> func.HttpResponse:
+    """
+    Return a generated document as .docx bytes, or as base64 in a JSON body.
+    JSON requests get the double-encoded body the Power Automate flows parse.
+    """
+    if wants_binary_response(req):
+        return docx_response(req, content, filename)
+
+    return http_response(
+        req,
+        base64_json_body("new_document_content", content, double_encoded=not is_binary_request(req)),
+        mimetype=JSON_MIMETYPE,
+        status_code=200
+    )
+
+
+@app.route(route="func_build_philips_scorecard_batch")
+def func_build_philips_scorecard_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """Process HTTP request to build Philips scorecards for several form submissions.
+
+    Args:
+        req (func.HttpRequest): The HTTP request containing 'form_row_ids' (list) and 'document_content'.
+
+    Returns:
+        func.HttpResponse: JSON response with a 'documents' list, one entry per form id
+        holding either 'new_document_content' or 'error'.
+    """
+    logging.info('%s processed a request.', inspect.currentframe().f_code.co_name)
+
+    try:
+        # Parse JSON data from the request body
+        json_data = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            "Invalid JSON",
+            status_code=400
+        )
+
+    # Check if the required keys are present in the JSON data
+    if 'form_row_ids' not in json_data or 'document_content' not in json_data:
+        return func.HttpResponse(
+            "Missing required keys: 'form_row_ids' and/or 'document_content'",
+            status_code=400
+        )
+
+    form_row_ids = json_data['form_row_ids']
+    if (not isinstance(form_row_ids, list) or not form_row_ids
+            or not all(str(form_row_id).isdigit() for form_row_id in form_row_ids)):
+        return func.HttpResponse(
+            "'form_row_ids' must be a non-empty list of integer ids",
+            status_code=400
+        )
+
+    try:
+        document_content = decode_base64(json_data['document_content'])
+    except ValueError as e:
+        return func.HttpResponse(str(e), status_code=400)
+
+    generator = scorecard_generator()
+    max_batch_size = generator.scorecard_config.max_batch_size
+    if len(form_row_ids) > max_batch_size:
+        return func.HttpResponse(
+            f"At most {max_batch_size} 'form_row_ids' are accepted per request",
+            status_code=400
+        )
+
+    form_row_ids = [int(form_row_id) for form_row_id in form_row_ids]
+    documents = generator.build_scorecards(document_content, form_row_ids)
+
+    json_response = {"documents": [
+        {"form_row_id": document.form_row_id, "error": document.error} if document.error is not None
+        else {"form_row_id": document.form_row_id,
+              "new_document_content": encode_base64(document.content)}
+        for document in documents
+    ]}
+
+    return http_response(
+        req,
+        json.dumps(json_response),
+        mimetype=JSON_MIMETYPE,
+        status_code=200
+    )
+    
+
+@app.route(route="func_remediation_list_generator")
+async def func_remediation_list_generator(req: func.HttpRequest) -> func.HttpResponse:
+    """Process HTTP request to generate remediation list from provided Excel and template data.
+
+    The workbook and template can also be uploaded as the multipart files
+    'excel_content' and 'output_template_content', in which case the .docx
+    bytes are returned unless the Accept header asks for JSON.
+
+    'bypass_llm_cache' (JSON key, form field or query parameter) asks the
+    model again instead of reusing the cached analysis of the same findings.
+
+    Args:
+        req (func.HttpRequest): The HTTP request containing JSON data.
+
+    Returns:
+        func.HttpResponse: JSON response with generated document data, the .docx document or error message.
+    """
+    if is_binary_request(req):
+        # Two files are needed, a raw body can only carry one
+        if not is_multipart_request(req):
+            return func.HttpResponse(
+                "Upload 'excel_content' and 'output_template_content' as multipart/form-data",
+                status_code=400
+            )
+        excel_content = get_upload(req, 'excel_content')
+        output_template_content = get_upload(req, 'output_template_content')
+        if not excel_content or not output_template_content:
+            return func.HttpResponse(
+                "Missing required multipart uploads: 'excel_content' and/or 'output_template_content'",
+                status_code=400
+            )
+        bypass_cache = parse_flag(get_parameter(req, 'bypass_llm_cache'))
+        new_content = await build_remediation_list(excel_content, output_template_content, bypass_cache)
+        return document_response(req, new_content, "remediation_list.docx")
+
+    try:
+        # Parse JSON data from the request body
+        json_data = req.get_json()
+    except ValueError:
+        return func.HttpResponse(
+            "Invalid JSON",
+            status_code=400
+        )    
+
+    # Check if the required keys are present in the JSON data
+    if 'excel_content' not in json_data or 'output_template_content' not in json_data:
+        return func.HttpResponse(
+            "Missing required keys: 'excel_content' and/or 'output_template_content'",
+            status_code=400
+        )
+    # Base64 is decoded here at the edge, the generator works on bytes
+    try:
+        excel_content = decode_base64(json_data['excel_content'])
+        output_template_content = decode_base64(json_data['output_template_content'])
+    except ValueError as e:
+        return func.HttpResponse(str(e), status_code=400)
+
+    bypass_cache = parse_flag(json_data.get('bypass_llm_cache') or req.params.get('bypass_llm_cache'))
+    new_content = await build_remediation_list(excel_content, output_template_content, bypass_cache)
+    return document_response(req, new_content, "remediation_list.docx")
+
+
+async def build_remediation_list(excel_content: bytes, output_template_content: bytes,
+                                 bypass_cache: bool = False) -> bytes:
+    from philips_scorecard.config.registry import get_registry
+    from philips_scorecard.remediation_list_generator import FindingsDocumentGenerator
+    from philips_scorecard.utils.llm_cache import get_llm_cache
+
+    registry = get_registry()
+
+    # One async client per event loop, its HTTP connections stay open between requests
+    findings_document_generator = FindingsDocumentGenerator(
+        registry.async_openai_client(), registry.api_config(), get_llm_cache()
+    )
+    return await findings_document_generator.build_docx_output_bytes(
+        excel_content, output_template_content, bypass_cache
+    )
+
+@app.warm_up_trigger('warmup')
+async def warmup(warmup) -> None:
+    """Preload the rules, templates, DB pool and clients when the host starts an instance.
+
+    The Functions warmup trigger only fires on plans with pre-warmed instances,
+    func_warmup runs the same steps on request everywhere else.
+    """
+    from philips_scorecard.warmup import warm_up_async
+    await warm_up_async()
+
+
+@app.route(route="func_warmup")
+async def func_warmup(req: func.HttpRequest) -> func.HttpResponse:
+    """Run the warmup steps and return how long each took.
+
+    Returns:
+        func.HttpResponse: JSON report of the steps, 200 if all of them succeeded, 503 otherwise.
+    """
+    from philips_scorecard.warmup import warm_up_async
+    report = await warm_up_async()
+    return http_response(
+        req,
+        json.dumps(report),
+        mimetype=JSON_MIMETYPE,
+        status_code=200 if report['ok'] else 503
+    )
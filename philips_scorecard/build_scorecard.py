@@ -1,153 +1,106 @@
+import asyncio
+import base64
 import json
 import logging
-import pandas as pd
-from philips_scorecard.utils.doc_converters import convert_doc_to_base64
-from philips_scorecard.utils.doc_converters import get_document
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from philips_scorecard.utils.doc_converters import convert_doc_to_bytes
+from philips_scorecard.utils.doc_converters import template_cache, ParsedTemplate
 from philips_scorecard.templates import philips
-from philips_scorecard.config.config_loader import ConfigLoader
-from philips_scorecard.database.azure_client import AzureClientMSSQL
+from philips_scorecard.rules_engine import DecisionTable, Rule, RuleResult, evaluate_submission
+from philips_scorecard.config.registry import get_registry
+from philips_scorecard.database.rules_cache import get_rules_cache, CompiledRules
+from philips_scorecard.database.form_query import form_query_cache
 from philips_scorecard.utils.insert_html_to_docx import replace_placeholders_in_docx
 
 
+@dataclass
+class ScorecardDocument:
+    """One scorecard of a batch: the .docx bytes, or why it could not be built."""
+    form_row_id: int
+    content: Optional[bytes] = None
+    error: Optional[str] = None
+
+
 class ScorecardGenerator:
     def __init__(self):
-        self.config_loader = ConfigLoader()
-        self.db_config = self.config_loader.load_database_config()
-        self.azure_client = AzureClientMSSQL(
-            server=self.db_config.server, 
-            database=self.db_config.database, 
-            username=self.db_config.username,
-            password=self.db_config.password
-        )
-
-    def load_rules_data(self):
-        """Load rules data from the database into a pandas DataFrame."""
+        # Configuration and the database client are shared by the whole process
+        registry = get_registry()
+        self.db_config = registry.database_config()
+        self.scorecard_config = registry.scorecard_config()
+        self.azure_client = registry.database_client()
+
+    def load_rules_data(self) -> CompiledRules:
+        """Load rules and their compiled decision table from the process-wide rules cache (read-only)."""
         try:
-            rules_df = self.azure_client.load_table_to_dataframe("philips_rules")
-            rules_df['rule_id'] = rules_df['rule_id'].str.lower()
-            return rules_df.sort_values('rule_no')
+            return get_rules_cache().get_compiled_rules(self.azure_client)
         except Exception as e:
             raise Exception(f"Failed to load rules data: {str(e)}")
 
-    def load_form_data(self, form_row_id: int) -> pd.DataFrame:
-        """Load form submission from db into a pandas DataFrame."""
+    def load_form_data(self, form_row_id: int, rules: Optional[CompiledRules] = None) -> dict:
+        """
+        Load a form submission from db as a {column: value} mapping, with only
+        the columns the rules read (see database/form_query.py).
+        """
         try:
-            query = f"SELECT * FROM dbo.philips_form_submission WHERE id = {form_row_id}"
-            return self.azure_client.load_table_to_dataframe(
-                table_name="philips_form_submission",
-                custom_query=query
-            )
+            form_query = form_query_cache.get(self.azure_client, rules or self.load_rules_data())
+            records = self.azure_client.fetch_records(form_query.single_sql, (int(form_row_id),))
         except Exception as e:
+            # A column may have been dropped, look at the table again next time
+            form_query_cache.invalidate()
             raise Exception(f"Failed to load form data: {str(e)}")
 
-    def process_form_data(self, form_data_df, rules_df):
-        """Process form data against rules and generate results."""
-        results = []
-        
-        for _, rule in rules_df.iterrows():
-            rule_id = rule['rule_id']
-            
-            if rule_id not in form_data_df.columns:
-                continue
-                
-            answer = form_data_df[rule_id].iloc[0]
-            answer_lower = str(answer).lower()
-                
-            justification_key = f"{rule_id}_justified"
-            has_justification = (justification_key in form_data_df.columns and 
-                               str(form_data_df[justification_key].iloc[0]).lower() == 'yes')
-
-            # We are hardcoding these changes until the next revision is put in place
-            # until the next round of changes are implemented
-            if rule['rule_id'] == 'bp_4_3':
-                if answer_lower == 'yes':
-                    meets_requirements = has_justification
-                else: # answser is no, no need for justification
-                    meets_requirements = True
-            elif rule['rule_id'] == 'bp_4_4':
-                if answer_lower == 'yes':
-                    meets_requirements = False
-                else: # answer is no
-                    meets_requirements = True
-            elif rule['rule_id'] == 'bp_4_5':
-                if answer_lower == 'yes':
-                    meets_requirements = True
-                else: # answer is no, use justification
-                    meets_requirements = has_justification
-            # Are All SSID in the WLAN being broadcast?
-            elif rule['rule_id'] == 'bp_8_3':
-                if answer_lower == 'yes':
-                    meets_requirements = True
-                else: # answer is no, use justification
-                    meets_requirements = has_justification
-            # Is AES/CCMP encryption in use on all SSIDs?
-            elif rule['rule_id'] == 'bp_9_1':
-                if answer_lower == 'yes':
-                    meets_requirements = True
-                else:
-                    meets_requirements = has_justification
-
-            elif answer_lower == 'yes':
-                if justification_key in form_data_df.columns:
-                    meets_requirements = has_justification
-                else:
-                    meets_requirements = rule['on_yes'] == 'PASS'
-                    
-            elif answer_lower == 'no':
-                meets_requirements = rule['on_no'] == 'PASS'
-                
-            else:
-                meets_requirements = True
-
-            meets_requirements_str = 'Yes' if meets_requirements else 'No'
-
-            result = {
-                'id': rule['rule_id'],
-                'category': rule['bp_section'],
-                'message': rule['question'],
-                'answer': answer,
-                'meets_requirements': meets_requirements_str,
-                'findings': rule['finding'],
-                'recommendations': rule['recommendation'],
-                'question_category': rule['question_category']
-            }
-            
-            results.append(result)
-        
-        return results
+        if not records:
+            raise Exception(f"Failed to load form data: Form submission {form_row_id} not found")
+        return records[0]
+
+    def load_forms_data(self, form_row_ids: list, rules: Optional[CompiledRules] = None) -> Dict[int, dict]:
+        """Load several form submissions from db with one set-based query, keyed by id."""
+        try:
+            form_query = form_query_cache.get(self.azure_client, rules or self.load_rules_data())
+            id_list = ",".join(str(int(form_row_id)) for form_row_id in sorted(set(form_row_ids)))
+            submissions = {}
+            for record in self.azure_client.fetch_records(form_query.batch_sql, (id_list,)):
+                submissions.setdefault(record['id'], record)
+            return submissions
+        except Exception as e:
+            form_query_cache.invalidate()
+            raise Exception(f"Failed to load form data: {str(e)}")
+
+    def process_form_data(self, submission: Mapping, rules: Sequence[Rule],
+                          decision_table: Optional[DecisionTable] = None) -> List[RuleResult]:
+        """Process a form submission against the rules and generate results."""
+        return evaluate_submission(submission, rules, decision_table)
 
     def get_philips_sections(self, results):
         """Build report sections based on processed results."""
         sections = {}
         
         category = 'bp_philips'
-        category_results = [r for r in results if r['category'] == category]
+        category_results = [r for r in results if r.category == category]
         
-        html_content_requirement_results = philips.get_table_template()
-        html_content_findings_table = philips.get_findings_and_recommendations_table()
+        requirement_results_table = philips.get_table_block()
+        findings_table = philips.get_findings_and_recommendations_table_block()
         
         for result in category_results:
-            bg_color = philips.GREEN if result['meets_requirements'] == 'Yes' else philips.RED
-            html_content_requirement_results += philips.get_row_template(bg_color, result)
-
-            if result['meets_requirements'] != 'Yes':
-                html_content_findings_table += philips.get_findings_and_recommendations_row(
-                    result['findings'], 
-                    result['recommendations']
-                )
-                
-        html_content_requirement_results += "</table>"
-        html_content_findings_table += "</table>"
+            bg_color = philips.GREEN if result.meets else philips.RED
+            requirement_results_table.rows.append(philips.get_row_block(bg_color, result))
+
+            if not result.meets:
+                findings_table.rows.append(philips.get_findings_and_recommendations_row_block(
+                    result.findings, 
+                    result.recommendations
+                ))
         
-        sections[category] = html_content_requirement_results
+        sections[category] = [requirement_results_table]
 
         total_results = len(category_results)
-        passing_results = sum(1 for r in category_results if r['meets_requirements'] == 'Yes')
+        passing_results = sum(1 for r in category_results if r.meets)
 
         placeholder_findings = f"{category}_findings"
-        sections[placeholder_findings] = (html_content_findings_table 
+        sections[placeholder_findings] = ([findings_table]
                                         if passing_results != total_results 
-                                        else "")
+                                        else [])
 
         return sections
 
@@ -155,55 +108,148 @@ class ScorecardGenerator:
         """Build report sections based on processed results."""
         sections = {}
 
-        html_content_findings_table = philips.get_findings_and_recommendations_table()
-        categories = set(result['category'] for result in results)
+        findings_table = philips.get_findings_and_recommendations_table_block()
+        # Categories in rule order, so the combined findings are always listed the same way
+        categories = dict.fromkeys(result.category for result in results)
 
         for category in categories:
             if category == 'bp_philips':
                 continue
             
-            html_content_requirement_results = philips.get_table_template()
-            group_results = [result for result in results if result['category'] == category]
+            requirement_results_table = philips.get_table_block()
+            group_results = [result for result in results if result.category == category]
 
             for result in group_results:
-                bg_color = philips.GREEN if result['meets_requirements'] == 'Yes' else philips.RED
-                html_content_requirement_results += philips.get_row_template(bg_color, result)
-
-                if result['meets_requirements'] != 'Yes':
-                    html_content_findings_table += philips.get_findings_and_recommendations_row(
-                        result['findings'], 
-                        result['recommendations']
-                    )
+                bg_color = philips.GREEN if result.meets else philips.RED
+                requirement_results_table.rows.append(philips.get_row_block(bg_color, result))
+
+                if not result.meets:
+                    findings_table.rows.append(philips.get_findings_and_recommendations_row_block(
+                        result.findings, 
+                        result.recommendations
+                    ))
                 
-            html_content_requirement_results += "</table>"
-            sections[category] = html_content_requirement_results
+            sections[category] = [requirement_results_table]
 
             total_results = len(group_results)
-            passing_results = sum(1 for r in group_results if r['meets_requirements'] == 'Yes')
-            html_content_progress_bar = philips.get_progress_bar_table(passing_results, total_results)
+            passing_results = sum(1 for r in group_results if r.meets)
             placeholder_pbar = f"{category}_progressbar"
-            sections[placeholder_pbar] = html_content_progress_bar    
+            sections[placeholder_pbar] = [philips.get_progress_bar_table_block(passing_results, total_results)]
         
-        html_content_findings_table += "</table>"
-        sections['bp_combined_findings'] = html_content_findings_table
+        sections['bp_combined_findings'] = [findings_table]
 
         return sections
 
-    def build_scorecard(self, json_data: str) -> str:
-        """Main method to build the scorecard."""
-        json_dict = json.loads(json_data)
-        document = get_document(json_dict['document_content'])
-        form_row_id = json_dict['form_row_id']
-
-        form_df = self.load_form_data(int(form_row_id))
-        rules_df = self.load_rules_data()
-        results = self.process_form_data(form_df, rules_df)
+    def render_scorecard(self, template: ParsedTemplate, submission: Mapping, rules: CompiledRules):
+        """Fill the template placeholders for a single form submission."""
+        results = self.process_form_data(submission, rules.rules, rules.decision_table)
         
-        html_sections = {
+        sections = {
             **self.get_philips_sections(results),
             **self.get_bp_sections(results)
         }
-        replace_placeholders_in_docx(document, html_sections)
+        replace_placeholders_in_docx(template.document, sections, template.placeholder_index)
+        return template.document
+
+    def build_scorecard(self, json_data: str) -> str:
+        """Main method to build the scorecard. JSON wrapper of build_scorecard_bytes."""
+        json_dict = json.loads(json_data)
+        document_content = base64.b64decode(json_dict['document_content'])
+        form_row_id = json_dict['form_row_id']
+
+        new_content = self.build_scorecard_bytes(document_content, int(form_row_id))
+        return json.dumps({"new_document_content": base64.b64encode(new_content).decode("utf-8")})
+
+    def build_scorecard_bytes(self, document_content: bytes, form_row_id: int) -> bytes:
+        """Build the scorecard from the raw template bytes and return the .docx bytes."""
+        template = template_cache.get(document_content)
+
+        rules = self.load_rules_data()
+        submission = self.load_form_data(form_row_id, rules)
+        document = self.render_scorecard(template, submission, rules)
+
+        return convert_doc_to_bytes(document)
+
+    async def load_scorecard_data_async(self, form_row_id: int) -> Tuple[CompiledRules, dict]:
+        """
+        Load the rules and the submission on the database client's query threads.
+
+        Once the rules are cached, the submission is fetched with the columns of
+        the cached rules while their version is checked. Only the first request
+        of a worker, before any rules are cached, loads the two one after the other.
+        """
+        run = self.azure_client.run_blocking
+        cached_rules = get_rules_cache().current()
+        if cached_rules is None:
+            rules = await run(self.load_rules_data)
+            return rules, await run(self.load_form_data, form_row_id, rules)
 
-        new_content = convert_doc_to_base64(document)
-        return json.dumps({"new_document_content": new_content})
\ No newline at end of file
+        rules, submission = await asyncio.gather(
+            run(self.load_rules_data),
+            run(self.load_form_data, form_row_id, cached_rules)
+        )
+        if rules is not cached_rules:
+            # The rules changed meanwhile, the submission may lack their columns
+            submission = await run(self.load_form_data, form_row_id, rules)
+        return rules, submission
+
+    async def build_scorecard_bytes_async(self, document_content: bytes, form_row_id: int) -> bytes:
+        """
+        build_scorecard_bytes for async routes. The template is decoded on a
+        worker thread while the database is queried, and rendering runs off
+        the event loop as well.
+        """
+        template, (rules, submission) = await asyncio.gather(
+            asyncio.to_thread(template_cache.get, document_content),
+            self.load_scorecard_data_async(form_row_id)
+        )
+        return await asyncio.to_thread(
+            lambda: convert_doc_to_bytes(self.render_scorecard(template, submission, rules))
+        )
+
+    def build_scorecard_batch(self, json_data: str) -> str:
+        """JSON wrapper of build_scorecards, with base64 document content."""
+        json_dict = json.loads(json_data)
+        document_content = base64.b64decode(json_dict['document_content'])
+        form_row_ids = [int(form_row_id) for form_row_id in json_dict['form_row_ids']]
+
+        documents = []
+        for document in self.build_scorecards(document_content, form_row_ids):
+            if document.error is None:
+                documents.append({
+                    "form_row_id": document.form_row_id,
+                    "new_document_content": base64.b64encode(document.content).decode("utf-8")
+                })
+            else:
+                documents.append({"form_row_id": document.form_row_id, "error": document.error})
+
+        return json.dumps({"documents": documents})
+
+    def build_scorecards(self, document_content: bytes, form_row_ids: List[int]) -> List[ScorecardDocument]:
+        """
+        Build one scorecard per form id. The template is parsed and the rules
+        and submissions are queried once for the whole batch. A failing form is
+        reported in its own entry and does not fail the batch, a failing query
+        is reported in every entry.
+        """
+        try:
+            rules = self.load_rules_data()
+            submissions = self.load_forms_data(form_row_ids, rules)
+        except Exception as e:
+            logging.exception("Failed to load data for scorecard batch %s", form_row_ids)
+            return [ScorecardDocument(form_row_id, error=str(e)) for form_row_id in form_row_ids]
+
+        documents = []
+        for form_row_id in form_row_ids:
+            try:
+                submission = submissions.get(form_row_id)
+                if submission is None:
+                    raise Exception(f"Form submission {form_row_id} not found")
+
+                document = self.render_scorecard(template_cache.get(document_content), submission, rules)
+                documents.append(ScorecardDocument(form_row_id, content=convert_doc_to_bytes(document)))
+            except Exception as e:
+                logging.exception("Failed to build scorecard for form %s", form_row_id)
+                documents.append(ScorecardDocument(form_row_id, error=str(e)))
+
+        return documents
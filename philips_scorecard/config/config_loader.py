@@ -2,8 +2,11 @@ import yaml
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from dataclasses import dataclass
-from openai import AzureOpenAI
+from dataclasses import dataclass, field
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AzureOpenAI, AsyncAzureOpenAI
 
 @dataclass
 class DatabaseConfig:
@@ -11,6 +14,20 @@ class DatabaseConfig:
     database: str
     username: str
     password: str
+    pool_size: int = 5
+    pool_max_idle_seconds: float = 300
+
+@dataclass
+class PerFloorAnalysisConfig:
+    """Optional remediation analysis with one LLM call per floor sheet"""
+    enabled: bool = False
+    # Floor calls in flight for one document
+    max_concurrency: int = 3
+    # Estimated prompt plus completion tokens for all floor calls of a document
+    token_budget: int = 4000
+    # Floors still unanswered after this are reported as not analyzed
+    time_budget_seconds: float = 45
+    max_tokens_per_floor: int = 150
 
 @dataclass
 class APIConfig:
@@ -18,13 +35,46 @@ class APIConfig:
     api_version: str
     azure_endpoint: str
     model: str
+    timeout_seconds: float = 30
+    max_concurrent_requests: int = 4
+    max_retries: int = 2
+    # Failure clusters listed in a prompt, the rest are totalled on one line
+    summary_top_k: int = 20
+    # Estimated tokens allowed for the failure summary of a prompt
+    summary_token_budget: int = 400
+    per_floor: PerFloorAnalysisConfig = field(default_factory=PerFloorAnalysisConfig)
+
+@dataclass
+class ScorecardConfig:
+    # Form ids accepted by one batch request
+    max_batch_size: int = 50
+
+@dataclass
+class RulesCacheConfig:
+    check_interval_seconds: float
+    snapshot_path: Optional[Path]
+
+@dataclass
+class LLMCacheConfig:
+    enabled: bool
+    # None uses the default file in the temp directory
+    path: Optional[Path]
+    ttl_seconds: float
+    max_entries: int
+
+@dataclass
+class WarmupConfig:
+    # Templates parsed into the template cache, relative to the project root
+    template_paths: List[Path]
+    # Open a pooled connection and load the rules
+    database: bool
 
 class ConfigurationError(Exception):
     """Raised when there's an error loading configuration"""
     pass
 
 class ConfigLoader:
-    def __init__(self):
+    def __init__(self, config_path: Optional[Path] = None, env_path: Optional[Path] = None):
         """
         Initialize the config loader using project root-relative paths
         """
@@ -32,18 +82,26 @@ class ConfigLoader:
         self.project_root = Path(__file__).parent.parent.parent
         
         # Set paths relative to project root
-        self.config_path = self.project_root / "config" / "config.yml"
-        self.env_path = self.project_root / ".env"
+        self.config_path = Path(config_path) if config_path else self.project_root / "config" / "config.yml"
+        self.env_path = Path(env_path) if env_path else self.project_root / ".env"
         
         # Load environment variables
         load_dotenv(self.env_path)
+
+        # config.yml parsed once per loader
+        self._config: Optional[dict] = None
+
+    def load_config(self) -> dict:
+        """The parsed config.yml, read on first use"""
+        if self._config is None:
+            with open(self.config_path, 'r') as f:
+                self._config = yaml.safe_load(f) or {}
+        return self._config
     
     def load_database_config(self) -> DatabaseConfig:
         """Load database configuration from config file and environment variables"""
         try:
-            # Load YAML config
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            config = self.load_config()
             
             db_config = config.get('db', {})
             
@@ -69,7 +127,9 @@ class ConfigLoader:
                 server=db_config['server'],
                 database=db_config['database'],
                 username=username,
-                password=password
+                password=password,
+                pool_size=int(db_config.get('pool_size', 5)),
+                pool_max_idle_seconds=float(db_config.get('pool_max_idle_seconds', 300))
             )
             
         except FileNotFoundError:
@@ -80,9 +140,7 @@ class ConfigLoader:
     def load_api_config(self) -> APIConfig:
         """Load API configuration from environment variables"""
         try:
-            # Load YAML config
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            config = self.load_config()
             
             llm_config = config.get('llm', {})
             
@@ -94,26 +152,129 @@ class ConfigLoader:
             # Validate required fields
             if not api_key:
                 raise ConfigurationError("API key not found in environment variables.")
+
+            per_floor_config = llm_config.get('per_floor') or {}
             
             return APIConfig(
                 api_key=api_key,
                 api_version=api_version,
                 azure_endpoint=azure_endpoint,
-                model=model
+                model=model,
+                timeout_seconds=float(llm_config.get('timeout_seconds', 30)),
+                max_concurrent_requests=int(llm_config.get('max_concurrent_requests', 4)),
+                max_retries=int(llm_config.get('max_retries', 2)),
+                summary_top_k=int(llm_config.get('summary_top_k', 20)),
+                summary_token_budget=int(llm_config.get('summary_token_budget', 400)),
+                per_floor=PerFloorAnalysisConfig(
+                    enabled=bool(per_floor_config.get('enabled', False)),
+                    max_concurrency=int(per_floor_config.get('max_concurrency', 3)),
+                    token_budget=int(per_floor_config.get('token_budget', 4000)),
+                    time_budget_seconds=float(per_floor_config.get('time_budget_seconds', 45)),
+                    max_tokens_per_floor=int(per_floor_config.get('max_tokens_per_floor', 150))
+                )
             )
         except Exception as e:
             raise ConfigurationError(f"Error loading API configuration: {e}")
         
-    def initialize_openai_client(self) -> AzureOpenAI:
+    def load_scorecard_config(self) -> ScorecardConfig:
+        """Load the scorecard settings from the config file"""
+        try:
+            config = self.load_config()
+
+            scorecard_config = config.get('scorecard') or {}
+
+            return ScorecardConfig(
+                max_batch_size=int(scorecard_config.get('max_batch_size', 50))
+            )
+        except FileNotFoundError:
+            raise ConfigurationError(f"Configuration file not found: {self.config_path}")
+        except (yaml.YAMLError, TypeError, ValueError) as e:
+            raise ConfigurationError(f"Error loading scorecard configuration: {str(e)}")
+
+    def load_rules_cache_config(self) -> RulesCacheConfig:
+        """Load rules cache settings from the config file"""
+        try:
+            config = self.load_config()
+
+            cache_config = config.get('rules_cache') or {}
+
+            snapshot_path = cache_config.get('snapshot_path')
+            if snapshot_path:
+                snapshot_path = self.project_root / snapshot_path
+
+            return RulesCacheConfig(
+                check_interval_seconds=float(cache_config.get('check_interval_seconds', 30)),
+                snapshot_path=snapshot_path
+            )
+        except FileNotFoundError:
+            raise ConfigurationError(f"Configuration file not found: {self.config_path}")
+        except (yaml.YAMLError, TypeError, ValueError) as e:
+            raise ConfigurationError(f"Error loading rules cache configuration: {str(e)}")
+
+    def load_llm_cache_config(self) -> LLMCacheConfig:
+        """Load the LLM answer cache settings from the config file"""
+        try:
+            config = self.load_config()
+
+            cache_config = config.get('llm_cache') or {}
+
+            path = cache_config.get('path')
+            if path:
+                path = self.project_root / path
+
+            return LLMCacheConfig(
+                enabled=bool(cache_config.get('enabled', True)),
+                path=path or None,
+                ttl_seconds=float(cache_config.get('ttl_seconds', 7 * 24 * 3600)),
+                max_entries=int(cache_config.get('max_entries', 1000))
+            )
+        except FileNotFoundError:
+            raise ConfigurationError(f"Configuration file not found: {self.config_path}")
+        except (yaml.YAMLError, TypeError, ValueError) as e:
+            raise ConfigurationError(f"Error loading LLM cache configuration: {str(e)}")
+
+    def load_warmup_config(self) -> WarmupConfig:
+        """Load the warmup settings from the config file"""
+        try:
+            config = self.load_config()
+
+            warmup_config = config.get('warmup') or {}
+
+            return WarmupConfig(
+                template_paths=[self.project_root / path for path in warmup_config.get('template_paths') or []],
+                database=bool(warmup_config.get('database', True))
+            )
+        except FileNotFoundError:
+            raise ConfigurationError(f"Configuration file not found: {self.config_path}")
+        except (yaml.YAMLError, TypeError, ValueError) as e:
+            raise ConfigurationError(f"Error loading warmup configuration: {str(e)}")
+
+    def initialize_openai_client(self) -> 'AzureOpenAI':
         '''
         Initialize the OpenAI client
-        This is a bit redundant at the momement.
         '''
-        config_loader = ConfigLoader()
-        api_config = config_loader.load_api_config()
+        # openai is only imported by the routes that call the model
+        from openai import AzureOpenAI
+        api_config = self.load_api_config()
 
         return AzureOpenAI(
             api_key=api_config.api_key,
             api_version=api_config.api_version,
             azure_endpoint=api_config.azure_endpoint
-        )       
\ No newline at end of file
+        )
+
+    def initialize_async_openai_client(self, api_config: Optional[APIConfig] = None) -> 'AsyncAzureOpenAI':
+        """
+        Initialize the async OpenAI client used by the async routes.
+        Close it when done, e.g. with `async with`.
+        """
+        from openai import AsyncAzureOpenAI
+        api_config = api_config or self.load_api_config()
+
+        return AsyncAzureOpenAI(
+            api_key=api_config.api_key,
+            api_version=api_config.api_version,
+            azure_endpoint=api_config.azure_endpoint,
+            timeout=api_config.timeout_seconds,
+            max_retries=api_config.max_retries
+        )
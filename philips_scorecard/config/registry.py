@@ -0,0 +1,174 @@
+"""
+Process-wide registry of configuration and clients.
+
+config.yml and .env are parsed once, and the database and OpenAI clients are
+created on first use and shared by every request of the worker process. The
+files' modification times are checked at most every `check_interval_seconds`;
+when either changed, the configuration is parsed again and the clients are
+rebuilt on their next use. Clients handed out before a reload stay usable
+until their callers drop them.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Optional, TYPE_CHECKING
+from dotenv import load_dotenv
+from philips_scorecard.config.config_loader import (
+    ConfigLoader, DatabaseConfig, APIConfig, ScorecardConfig, RulesCacheConfig, LLMCacheConfig, WarmupConfig
+)
+
+if TYPE_CHECKING:
+    from openai import AzureOpenAI
+    from philips_scorecard.database.azure_client import AzureClientMSSQL
+
+
+class ConfigRegistry:
+    def __init__(self, check_interval_seconds: float = 5, config_path=None, env_path=None):
+        """config_path and env_path default to the project's config/config.yml and .env"""
+        self.check_interval_seconds = check_interval_seconds
+        self._paths = (config_path, env_path)
+        self._lock = threading.RLock()
+        self._loader = ConfigLoader(*self._paths)
+        self._mtimes = self._file_mtimes()
+        self._last_checked = time.monotonic()
+        self._values = {}
+        # The async client's connections belong to the event loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.reloads = 0
+
+    def _file_mtimes(self) -> tuple:
+        mtimes = []
+        for path in (self._loader.config_path, self._loader.env_path):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _check_reload(self):
+        if time.monotonic() - self._last_checked < self.check_interval_seconds:
+            return
+        with self._lock:
+            self._last_checked = time.monotonic()
+            mtimes = self._file_mtimes()
+            if mtimes != self._mtimes:
+                self._reload_locked(mtimes)
+
+    def _reload_locked(self, mtimes: tuple):
+        if mtimes[1] != self._mtimes[1]:
+            # A changed .env must win over the values loaded from the old one
+            load_dotenv(self._loader.env_path, override=True)
+
+        old_database_config = self._values.get('database_config')
+        self._loader = ConfigLoader(*self._paths)
+        self._values.clear()
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._mtimes = mtimes
+        self.reloads += 1
+
+        if old_database_config is not None and self._database_settings_changed(old_database_config):
+            # Pooled connections were opened with the old settings
+            from philips_scorecard.database.azure_client import retire_pool
+            retire_pool(old_database_config.server, old_database_config.database, old_database_config.username)
+        # Replaced OpenAI clients are not closed here: requests that got them
+        # earlier may still be waiting on the model. Their connection pools are
+        # closed when the last reference is gone.
+        logging.info("Configuration changed, reloaded %s", self._loader.config_path)
+
+    def _database_settings_changed(self, old_database_config: DatabaseConfig) -> bool:
+        """True if the reloaded database settings differ from the ones the pool was built with"""
+        try:
+            database_config = self._values['database_config'] = self._loader.load_database_config()
+        except Exception as e:
+            logging.warning("Database configuration not reloaded: %s", str(e))
+            return True
+        # Server, credentials and pool sizing all shape the pool
+        return database_config != old_database_config
+
+    def _get(self, name: str, factory: Callable):
+        self._check_reload()
+        value = self._values.get(name)
+        if value is None:
+            with self._lock:
+                value = self._values.get(name)
+                if value is None:
+                    value = self._values[name] = factory()
+        return value
+
+    def reload(self):
+        """Parse the configuration again and rebuild the clients on next use"""
+        with self._lock:
+            self._reload_locked(self._file_mtimes())
+
+    def database_config(self) -> DatabaseConfig:
+        return self._get('database_config', lambda: self._loader.load_database_config())
+
+    def api_config(self) -> APIConfig:
+        return self._get('api_config', lambda: self._loader.load_api_config())
+
+    def scorecard_config(self) -> ScorecardConfig:
+        return self._get('scorecard_config', lambda: self._loader.load_scorecard_config())
+
+    def rules_cache_config(self) -> RulesCacheConfig:
+        return self._get('rules_cache_config', lambda: self._loader.load_rules_cache_config())
+
+    def llm_cache_config(self) -> LLMCacheConfig:
+        return self._get('llm_cache_config', lambda: self._loader.load_llm_cache_config())
+
+    def warmup_config(self) -> WarmupConfig:
+        return self._get('warmup_config', lambda: self._loader.load_warmup_config())
+
+    def database_client(self) -> 'AzureClientMSSQL':
+        # pymssql is only imported by the routes that query the database
+        from philips_scorecard.database.azure_client import AzureClientMSSQL
+
+        def create():
+            db_config = self.database_config()
+            return AzureClientMSSQL(
+                server=db_config.server,
+                database=db_config.database,
+                username=db_config.username,
+                password=db_config.password,
+                pool_size=db_config.pool_size,
+                pool_max_idle_seconds=db_config.pool_max_idle_seconds
+            )
+        return self._get('database_client', create)
+
+    def openai_client(self) -> 'AzureOpenAI':
+        return self._get('openai_client', lambda: self._loader.initialize_openai_client())
+
+    def async_openai_client(self):
+        """The AsyncAzureOpenAI client of the running event loop, shared by its requests"""
+        self._check_reload()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._loader.initialize_async_openai_client(self.api_config())
+                self._async_clients[loop] = client
+        return client
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'reloads': self.reloads,
+                'loaded': sorted(self._values),
+                'async_clients': len(self._async_clients)
+            }
+
+
+_registry: Optional[ConfigRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ConfigRegistry:
+    """Return the process-wide configuration and client registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ConfigRegistry()
+    return _registry
@@ -1,43 +1,333 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
 import pymssql
-import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Optional
+from dataclasses import dataclass, asdict
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Errors that may mean the connection itself is unusable. pymssql also raises
+# OperationalError for many ordinary server errors, so a ping decides.
+CONNECTION_ERRORS = (pymssql.OperationalError, pymssql.InterfaceError)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """True if the error, or the driver error pandas wrapped it around, may be a connection failure."""
+    return isinstance(error, CONNECTION_ERRORS) or isinstance(error.__cause__, CONNECTION_ERRORS)
+
+
+@dataclass
+class PoolMetrics:
+    hits: int = 0       # acquisitions served by an idle pooled connection
+    opens: int = 0      # new connections opened (login handshakes)
+    waits: int = 0      # acquisitions that had to wait for a free slot
+    timeouts: int = 0   # acquisitions that gave up waiting
+    discards: int = 0   # connections closed as expired or broken
+    in_use: int = 0
+    idle: int = 0
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections.
+
+    Idle connections older than `max_idle_seconds` are closed instead of reused,
+    and connections idle longer than `health_check_after_seconds` are pinged
+    with `SELECT 1` before being handed out.
+    """
+
+    def __init__(self, connect: Callable, max_size: int = 5, max_idle_seconds: float = 300,
+                 health_check_after_seconds: float = 30, acquire_timeout: float = 30):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()  # (connection, released_at), most recently used on the right
+        self._size = 0        # idle + in use
+        self._cond = threading.Condition()
+        self._metrics = PoolMetrics()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._retired = False
+
+    @property
+    def executor(self) -> Optional[ThreadPoolExecutor]:
+        """
+        Threads for the blocking queries of async callers, one per connection.
+        More threads would only wait in acquire(), and a slow query cannot tie
+        up the event loop's default executor.
+
+        None once the pool is retired; the last queries of its clients then run
+        on the event loop's default executor.
+        """
+        if self._executor is None:
+            with self._cond:
+                if self._executor is None and not self._retired:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix='mssql')
+        return self._executor
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if there is room."""
+        deadline = time.monotonic() + self.acquire_timeout
+        waited = False
+
+        while True:
+            conn, released_at = None, None
+            # Expired connections are closed after the lock is released, see _close
+            expired = []
+            try:
+                with self._cond:
+                    while self._idle:
+                        conn, released_at = self._idle.pop()
+                        if time.monotonic() - released_at <= self.max_idle_seconds:
+                            break
+                        self._discard_locked(conn)
+                        expired.append(conn)
+                        conn = None
+
+                    if conn is None:
+                        if self._size < self.max_size:
+                            self._size += 1
+                        elif expired:
+                            # Their slots were freed, close them and look again
+                            continue
+                        else:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self._metrics.timeouts += 1
+                                raise Exception(
+                                    f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+                                )
+                            if not waited:
+                                self._metrics.waits += 1
+                                waited = True
+                            self._cond.wait(remaining)
+                            continue
+            finally:
+                self._close(expired)
+
+            if conn is not None:
+                if (time.monotonic() - released_at > self.health_check_after_seconds
+                        and not self.is_healthy(conn)):
+                    with self._cond:
+                        self._discard_locked(conn)
+                    self._close([conn])
+                    continue
+                with self._cond:
+                    self._metrics.hits += 1
+                return conn
+
+            # A slot was reserved above, open the connection outside the lock
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._metrics.opens += 1
+            return conn
+
+    def release(self, conn, broken: bool = False):
+        """Return a connection to the pool, or close it if it is broken or the pool is retired."""
+        with self._cond:
+            closing = broken or self._retired
+            if closing:
+                self._discard_locked(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if closing:
+            self._close([conn])
+
+    def retire(self):
+        """
+        Close the idle connections and stop the query threads. Connections in
+        use are closed on release instead of being pooled again.
+        """
+        with self._cond:
+            self._retired = True
+        self.close_all()
+        # Queued queries still run, new ones go to the default executor
+        self.shutdown_executor()
+
+    def close_all(self):
+        """Close every idle connection"""
+        closing = []
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard_locked(conn)
+                closing.append(conn)
+        self._close(closing)
+
+    def shutdown_executor(self):
+        """Stop the query threads once their queued work is done"""
+        with self._cond:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            self._metrics.idle = len(self._idle)
+            self._metrics.in_use = self._size - len(self._idle)
+            return asdict(self._metrics)
+
+    def _discard_locked(self, conn):
+        """Give up the slot of a connection. The caller closes it once the lock is released."""
+        self._size -= 1
+        self._metrics.discards += 1
+        self._cond.notify()
+
+    @staticmethod
+    def _close(connections):
+        # Closing a dead TDS socket can block, so this never runs under the pool lock
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+
+# Pools outlive individual clients so connections are reused across function invocations
+_pools: Dict[Tuple[str, str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool_metrics() -> dict:
+    """Metrics for every pool in this process, keyed by server/database."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {f"{server}/{database}": pool.metrics() for (server, database, _), pool in pools.items()}
+
+
+def retire_pool(server: str, database: str, username: str):
+    """
+    Stop handing out connections of a pool, e.g. after its credentials changed.
+    Its connections are closed once idle, clients created afterwards get a new pool.
+    """
+    with _pools_lock:
+        pool = _pools.pop((server, database, username), None)
+    if pool is not None:
+        pool.retire()
+
 
 class AzureClientMSSQL:
-    def __init__(self, server: str, database: str, username: str, password: str):
+    def __init__(self, server: str, database: str, username: str, password: str,
+                 pool_size: int = 5, pool_max_idle_seconds: float = 300):
         self.server = server
         self.database = database
         self.username = username
         self.password = password
 
+        key = (server, database, username)
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    connect=self._connect,
+                    max_size=pool_size,
+                    max_idle_seconds=pool_max_idle_seconds
+                )
+                _pools[key] = pool
+        self.pool = pool
+
+    def _connect(self):
+        return pymssql.connect(
+            server=self.server,
+            database=self.database,
+            user=f"{self.username}@{self.server.split('.')[0]}",
+            password=self.password,
+            # Pooled connections must not carry an open transaction between requests
+            autocommit=True
+        )
+
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        conn = None
+        """Context manager for pooled database connections"""
+        conn = self.pool.acquire()
+        broken = False
         try:
-            conn = pymssql.connect(
-                server=self.server,
-                database=self.database,
-                user=f"{self.username}@{self.server.split('.')[0]}",
-                password=self.password
-            )
             yield conn
+        except Exception as e:
+            broken = is_connection_error(e) and not self.pool.is_healthy(conn)
+            raise
         finally:
-            if conn is not None:
-                conn.close()
+            self.pool.release(conn, broken=broken)
 
-    def load_table_to_dataframe(self, table_name: str, schema: str = 'dbo', 
-                              custom_query: Optional[str] = None) -> pd.DataFrame:
+    def pool_metrics(self) -> dict:
+        """Hit/wait/open counters of this client's connection pool"""
+        return self.pool.metrics()
+
+    async def run_blocking(self, function: Callable, *args):
+        """Await function(*args) run on the pool's query threads, for blocking pymssql work in async routes"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool.executor, functools.partial(function, *args))
+
+    def load_table_to_dataframe(self, table_name: str, schema: str = 'dbo',
+                              custom_query: Optional[str] = None) -> 'pd.DataFrame':
         """Load data from Azure SQL table into a pandas DataFrame"""
-        try:
-            with self.get_connection() as conn:
-                if custom_query:
-                    query = custom_query
-                else:
-                    query = f"SELECT * FROM [{schema}].[{table_name}]"
-                
-                return pd.read_sql(query, conn)
-                
-        except Exception as e:
-            print(f"An error occurred: {str(e)}")
-            raise
\ No newline at end of file
+        import pandas as pd
+
+        if custom_query:
+            query = custom_query
+        else:
+            query = f"SELECT * FROM [{schema}].[{table_name}]"
+
+        return self._run_read(lambda conn: pd.read_sql(query, conn))
+
+    def fetch_records(self, query: str, params: Optional[tuple] = None) -> List[dict]:
+        """
+        Run a query and return its rows as {column: value} dicts, without pandas.
+        NULL is None. DECIMAL values become floats, like pd.read_sql returns them.
+        """
+        def read(conn):
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            return [
+                {column: float(value) if isinstance(value, Decimal) else value
+                 for column, value in zip(columns, row)}
+                for row in cursor.fetchall()
+            ]
+
+        return self._run_read(read)
+
+    def _run_read(self, read: Callable):
+        """Call read(connection) on a pooled connection"""
+        # A pooled connection can be dropped by the server while idle. Retry once
+        # on a fresh connection; the queries here are read-only.
+        for attempt in range(2):
+            conn = self.pool.acquire()
+            try:
+                result = read(conn)
+            except Exception as e:
+                broken = is_connection_error(e) and not self.pool.is_healthy(conn)
+                self.pool.release(conn, broken=broken)
+                if broken and attempt == 0:
+                    logging.warning("Database connection failed, reconnecting: %s", str(e))
+                    continue
+                logging.exception("Database query failed: %s", str(e))
+                raise
+            self.pool.release(conn)
+            return result
@@ -0,0 +1,158 @@
+"""
+Column-projected, parameterized queries for dbo.philips_form_submission.
+
+The scorecard only reads the rule answer columns and their `_justified`
+columns, so the SELECT list is built from the cached rules, intersected with
+the columns the table actually has (INFORMATION_SCHEMA). Free-text columns
+are never transferred.
+
+The id is bound through sp_executesql instead of being formatted into the SQL.
+pymssql substitutes parameters on the client, so a plain `WHERE id = %d` would
+still reach the server as a new ad hoc statement per id. Wrapped in
+sp_executesql, the statement text is the same for every id and Azure SQL
+reuses one cached plan. Batches pass their ids as one string through
+STRING_SPLIT, so every batch size shares a plan too.
+
+The query is rebuilt only when the rules change. plan_cache_stats() shows the
+server side reuse counts:
+
+    python -m philips_scorecard.database.form_query
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Optional, Sequence
+from philips_scorecard.config.registry import get_registry
+from philips_scorecard.database.azure_client import AzureClientMSSQL
+from philips_scorecard.database.rules_cache import CompiledRules
+from philips_scorecard.rules_engine import Rule
+
+FORM_TABLE = "philips_form_submission"
+ID_COLUMN = "id"
+
+COLUMNS_QUERY = (
+    "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+    "WHERE TABLE_SCHEMA = 'dbo' AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION"
+)
+
+# Cached plans of the form queries with their use counts. Needs VIEW DATABASE STATE.
+PLAN_CACHE_QUERY = (
+    "SELECT cp.objtype, cp.usecounts, cp.size_in_bytes, st.text "
+    "FROM sys.dm_exec_cached_plans AS cp "
+    "CROSS APPLY sys.dm_exec_sql_text(cp.plan_handle) AS st "
+    "WHERE st.text LIKE %s AND st.text NOT LIKE %s "
+    "ORDER BY cp.usecounts DESC"
+)
+
+
+def quote_identifier(name: str) -> str:
+    return '[' + name.replace(']', ']]') + ']'
+
+
+def projected_columns(rules: Sequence[Rule], table_columns: Sequence[str]) -> List[str]:
+    """id, then each rule's answer column and its _justified column, if the table has them"""
+    available = set(table_columns)
+    columns = [ID_COLUMN]
+    for rule in rules:
+        for column in (rule.rule_id, f"{rule.rule_id}_justified"):
+            if column in available and column not in columns:
+                columns.append(column)
+    return columns
+
+
+def _sp_executesql(statement: str, parameters: str, assignment: str) -> str:
+    """EXEC sp_executesql text for a statement, escaped for a T-SQL N'' literal and pymssql substitution"""
+    statement = statement.replace("'", "''").replace('%', '%%')
+    return f"EXEC sp_executesql N'{statement}', N'{parameters}', {assignment}"
+
+
+@dataclass(frozen=True)
+class FormQuery:
+    columns: List[str]
+    # The CompiledRules the query was built for
+    rules: CompiledRules
+
+    @cached_property
+    def select(self) -> str:
+        select_list = ', '.join(quote_identifier(column) for column in self.columns)
+        return f"SELECT {select_list} FROM [dbo].[{FORM_TABLE}]"
+
+    @cached_property
+    def single_sql(self) -> str:
+        """One submission, bound as (form_row_id,)"""
+        return _sp_executesql(f"{self.select} WHERE [{ID_COLUMN}] = @id", "@id int", "@id = %d")
+
+    @cached_property
+    def batch_sql(self) -> str:
+        """Several submissions, bound as (comma separated ids,)"""
+        return _sp_executesql(
+            f"{self.select} WHERE [{ID_COLUMN}] IN (SELECT CAST(value AS int) FROM STRING_SPLIT(@ids, ','))",
+            "@ids nvarchar(max)", "@ids = %s"
+        )
+
+
+class FormQueryCache:
+    """
+    Worker-wide FormQuery, rebuilt when the rules cache hands out a different
+    CompiledRules, i.e. when the rules version changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._query: Optional[FormQuery] = None
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, azure_client: AzureClientMSSQL, rules: CompiledRules) -> FormQuery:
+        query = self._query
+        if query is not None and query.rules is rules:
+            self.hits += 1
+            return query
+
+        with self._lock:
+            query = self._query
+            if query is not None and query.rules is rules:
+                self.hits += 1
+                return query
+
+            table_columns = [row['COLUMN_NAME'] for row in azure_client.fetch_records(COLUMNS_QUERY, (FORM_TABLE,))]
+            if not table_columns:
+                raise Exception(f"Table dbo.{FORM_TABLE} not found")
+            self._query = query = FormQuery(projected_columns(rules.rules, table_columns), rules)
+            self.builds += 1
+            logging.info("Form query selects %d of %d columns of %s",
+                         len(query.columns), len(table_columns), FORM_TABLE)
+            return query
+
+    def invalidate(self):
+        """Rebuild on next use, e.g. after a query failed on a dropped column"""
+        self._query = None
+
+    def stats(self) -> dict:
+        query = self._query
+        return {
+            'hits': self.hits,
+            'builds': self.builds,
+            'columns': len(query.columns) if query else None
+        }
+
+
+form_query_cache = FormQueryCache()
+
+
+def plan_cache_stats(azure_client: AzureClientMSSQL) -> List[dict]:
+    """
+    Plans Azure SQL has cached for queries on the form table, most used first.
+    A parameterized query shows up as one 'Prepared' plan with a growing
+    usecounts, per-id ad hoc queries as many 'Adhoc' plans used once.
+    """
+    return azure_client.fetch_records(PLAN_CACHE_QUERY, (f"%{FORM_TABLE}%", "%dm_exec_cached_plans%"))
+
+
+if __name__ == "__main__":
+    # Show how often the cached plans of the form queries were reused:
+    #   python -m philips_scorecard.database.form_query
+    client = get_registry().database_client()
+    for plan in plan_cache_stats(client):
+        print(f"{plan['objtype']:<10} {plan['usecounts']:>8}  {' '.join(plan['text'].split())[:120]}")
@@ -0,0 +1,221 @@
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+from philips_scorecard.config.registry import ConfigRegistry, get_registry
+from philips_scorecard.database.azure_client import AzureClientMSSQL
+from philips_scorecard.rules_engine import DecisionTable, Rule, compile_decision_table
+
+RULES_TABLE = "philips_rules"
+DECISIONS_TABLE = "philips_rule_decisions"
+
+# Row count plus a SHA-256 over the SHA-256 of every row's full JSON form,
+# concatenated in hash order. Unlike CHECKSUM_AGG(BINARY_CHECKSUM(*)) it covers
+# every column including the long finding/recommendation texts, and offsetting
+# edits cannot cancel out. The table is still only scanned server side.
+VERSION_QUERY = (
+    "SELECT COUNT(*) AS row_count, "
+    "CONVERT(varchar(64), HASHBYTES('SHA2_256', "
+    "STRING_AGG(CONVERT(varchar(max), row_hash, 2), '') WITHIN GROUP (ORDER BY row_hash)), 2) AS checksum "
+    "FROM (SELECT HASHBYTES('SHA2_256', (SELECT t.* FOR JSON PATH, WITHOUT_ARRAY_WRAPPER)) AS row_hash "
+    "FROM [dbo].[{table}] AS t) AS row_hashes"
+)
+
+TABLE_EXISTS_QUERY = "SELECT OBJECT_ID(N'[dbo].[{table}]', N'U') AS object_id"
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    rules: Tuple[Rule, ...]
+    decision_table: DecisionTable
+    # Rows of dbo.philips_rule_decisions, None when the table is missing and the defaults are used
+    decisions: Optional[List[dict]]
+    version: Optional[tuple]
+
+
+def _rule_order(rule: Rule) -> tuple:
+    # Rules without a rule number go last
+    missing = rule.rule_no is None or rule.rule_no != rule.rule_no
+    return (missing, 0 if missing else rule.rule_no)
+
+
+def normalize_rules(records) -> Tuple[Rule, ...]:
+    """Rules from {column: value} rows, with lowercased rule ids and sorted by rule number."""
+    return tuple(sorted((Rule.from_record(record) for record in records), key=_rule_order))
+
+
+class RulesCache:
+    """
+    Worker-wide cache of the philips_rules table, already normalized and sorted,
+    together with the decision table compiled from it and philips_rule_decisions.
+
+    The cached rules are refetched only when the version marker reported by the
+    database differs from the one they were loaded with. The marker itself is
+    checked at most once every `check_interval_seconds`.
+
+    The returned objects are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, check_interval_seconds: float = 30, snapshot_path: Optional[Path] = None):
+        self.check_interval_seconds = check_interval_seconds
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        # Swapped as one object so readers never see rules and decisions from different versions
+        self._entry: Optional[CompiledRules] = None
+        self._last_checked = 0.0
+        self.hits = 0
+        self.refreshes = 0
+
+    @property
+    def version(self) -> Optional[tuple]:
+        return self._entry.version if self._entry else None
+
+    def current(self) -> Optional[CompiledRules]:
+        """The cached rules without a version check, None before the first load"""
+        return self._entry
+
+    def get_compiled_rules(self, azure_client: AzureClientMSSQL) -> CompiledRules:
+        """Return the cached rules and decision table, refetching them if the tables have changed."""
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._last_checked < self.check_interval_seconds:
+            self.hits += 1
+            return entry
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            entry = self._entry
+            if entry is not None and time.monotonic() - self._last_checked < self.check_interval_seconds:
+                self.hits += 1
+                return entry
+
+            version = self.fetch_version(azure_client)
+            if entry is not None and entry.version == version:
+                self.hits += 1
+            else:
+                rules = normalize_rules(azure_client.fetch_records(f"SELECT * FROM [dbo].[{RULES_TABLE}]"))
+                decisions = self.load_decisions(azure_client) if version[2] is not None else None
+                self._entry = entry = self._compile(rules, decisions, version)
+                self.refreshes += 1
+                logging.info("Loaded %d rules into cache (version %s)", len(rules), version)
+
+            self._last_checked = time.monotonic()
+            return entry
+
+    def fetch_version(self, azure_client: AzureClientMSSQL) -> tuple:
+        """
+        Query the cheap version markers of the rules and decisions tables as
+        (rules count, rules checksum, decisions count, decisions checksum).
+        The decisions part is None while philips_rule_decisions does not exist.
+        """
+        version = self._fetch_table_version(azure_client, RULES_TABLE)
+        # Only a missing table means the defaults. Any other error, e.g. a
+        # dropped connection, is raised instead of caching the defaults.
+        exists = azure_client.fetch_records(TABLE_EXISTS_QUERY.format(table=DECISIONS_TABLE))[0]['object_id']
+        if exists is None:
+            return version + (None, None)
+        return version + self._fetch_table_version(azure_client, DECISIONS_TABLE)
+
+    @staticmethod
+    def _fetch_table_version(azure_client: AzureClientMSSQL, table: str) -> tuple:
+        row = azure_client.fetch_records(VERSION_QUERY.format(table=table))[0]
+        return (int(row['row_count']), row['checksum'])
+
+    @staticmethod
+    def load_decisions(azure_client: AzureClientMSSQL) -> List[dict]:
+        """Load philips_rule_decisions, called once the version check has found the table."""
+        return azure_client.fetch_records(f"SELECT * FROM [dbo].[{DECISIONS_TABLE}]")
+
+    @staticmethod
+    def _compile(rules: Tuple[Rule, ...], decisions: Optional[List[dict]],
+                 version: Optional[tuple]) -> CompiledRules:
+        return CompiledRules(
+            rules=rules,
+            decision_table=compile_decision_table(rules, decisions),
+            decisions=decisions,
+            version=version
+        )
+
+    def invalidate(self):
+        """Force a version check on the next call."""
+        self._last_checked = 0.0
+
+    def load_snapshot(self, path: Optional[Path] = None) -> bool:
+        """Warm the cache from a snapshot file written by save_snapshot."""
+        path = path or self.snapshot_path
+        if path is None or not Path(path).exists():
+            return False
+
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+            rules = normalize_rules(snapshot['rules'])
+            decisions = snapshot.get('decisions')
+            version = tuple(snapshot['version']) if snapshot.get('version') else None
+            entry = self._compile(rules, decisions, version)
+        except Exception as e:
+            logging.warning("Ignoring unreadable rules snapshot %s: %s", path, str(e))
+            return False
+
+        with self._lock:
+            if self._entry is None:
+                self._entry = entry
+                # Leave _last_checked at zero so the first request still confirms the version
+        logging.info("Warmed rules cache from %s (version %s)", path, version)
+        return True
+
+    def save_snapshot(self, path: Optional[Path] = None):
+        """Write the cached rules and their version to a snapshot file."""
+        path = Path(path or self.snapshot_path)
+        entry = self._entry
+        if entry is None:
+            raise Exception("Rules cache is empty, nothing to snapshot")
+
+        snapshot = {
+            'version': list(entry.version) if entry.version else None,
+            'rules': [asdict(rule) for rule in entry.rules],
+            'decisions': entry.decisions
+        }
+        with open(path, 'w') as f:
+            json.dump(snapshot, f, indent=2, default=str)
+
+
+_rules_cache: Optional[RulesCache] = None
+_rules_cache_lock = threading.Lock()
+
+
+def get_rules_cache(registry: Optional[ConfigRegistry] = None) -> RulesCache:
+    """
+    Return the process-wide rules cache, warming it from the snapshot on first use.
+    It is created with the settings of registry, by default the process registry.
+    """
+    global _rules_cache
+    if _rules_cache is None:
+        with _rules_cache_lock:
+            if _rules_cache is None:
+                cache_config = (registry or get_registry()).rules_cache_config()
+                cache = RulesCache(
+                    check_interval_seconds=cache_config.check_interval_seconds,
+                    snapshot_path=cache_config.snapshot_path
+                )
+                cache.load_snapshot()
+                _rules_cache = cache
+    return _rules_cache
+
+
+if __name__ == "__main__":
+    # Write a snapshot of the rules from the database, to the given path or the
+    # configured rules_cache.snapshot_path:
+    #   python -m philips_scorecard.database.rules_cache philips_scorecard/io/philips_rules_snapshot.json
+    import sys
+    client = get_registry().database_client()
+    cache = get_rules_cache()
+    cache.invalidate()
+    cache.get_compiled_rules(client)
+    path = sys.argv[1] if len(sys.argv) > 1 else cache.snapshot_path
+    if path is None:
+        raise SystemExit("No snapshot path given and rules_cache.snapshot_path is not set")
+    cache.save_snapshot(path)
+    print(f"Rules snapshot written to {path}")
@@ -1,41 +1,104 @@
-from openai import AzureOpenAI
+import asyncio
 import pandas as pd
 import azure.functions as func
 from docx import Document
 from io import BytesIO
+import base64
 import json
-from typing import List, Dict
-from philips_scorecard.config.config_loader import ConfigLoader
-from philips_scorecard.templates.philips import get_findings_and_recommendations_table, get_findings_and_recommendations_row
-from philips_scorecard.utils.doc_converters import get_document, convert_doc_to_base64, convert_base64_to_excel_sheets
-from philips_scorecard.utils.insert_html_to_docx import convert_html_to_docx_elements, replace_placeholders_in_docx
+from typing import List, Dict, Optional, Tuple
+from philips_scorecard.config.config_loader import ConfigLoader, APIConfig, PerFloorAnalysisConfig
+from philips_scorecard.templates.philips import (
+    get_findings_and_recommendations_table, get_findings_and_recommendations_row,
+    get_findings_and_recommendations_table_block, get_findings_and_recommendations_row_block
+)
+from philips_scorecard.utils.docx_blocks import Cell, Paragraph, Run, Table, text_runs
+from philips_scorecard.utils.doc_converters import template_cache, convert_doc_to_bytes, read_excel_columns
+from philips_scorecard.utils.insert_html_to_docx import (
+    convert_html_to_docx_elements, replace_placeholders_in_docx, locate_placeholders
+)
+from philips_scorecard.utils.llm_cache import LLMCache, make_cache_key
+from philips_scorecard.utils.prompt_compaction import compact_summary, format_summary, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from philips_scorecard.utils.llm_client import (
+    create_chat_completion, estimate_tokens, DEFAULT_MODEL, DEFAULT_TIMEOUT_SECONDS, DEFAULT_MAX_CONCURRENCY
+)
 import warnings
 import logging
 
 warnings.filterwarnings('ignore', message='Data Validation extension is not supported and will be removed', category=UserWarning)
 
+# The only workbook columns the report uses
+REMEDIATION_COLUMNS = ['Failure', 'Finding Details', 'Remediation Detail']
+# Findings this short are placeholders, not real findings
+MIN_FINDING_LENGTH = 10
+# Bump whenever the analysis prompt changes, cached answers of older prompts are not reused
+PROMPT_VERSION = 2
+
+TABLE_PLACEHOLDER = 'remediation_table'
+AI_REPORT_PLACEHOLDER = 'remediation_ai_report'
+
+SYSTEM_PROMPT = "You are a CWNE wireless network engineer performing a site survey of a hospital."
+
+
+async def discard_tasks(*tasks: asyncio.Task):
+    """
+    Cancel tasks whose result is no longer needed and wait for them to end.
+    A to_thread task keeps running until its thread returns, its error is dropped.
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 class FindingsDocumentGenerator:
-    def __init__(self, openai_client: AzureOpenAI):
+    def __init__(self, openai_client, api_config: Optional[APIConfig] = None, llm_cache: Optional[LLMCache] = None):
+        """
+        openai_client is an AsyncAzureOpenAI client, a synchronous AzureOpenAI
+        client also works. api_config supplies the model, timeout and concurrency.
+        Analyses are reused from llm_cache when one is given.
+        """
         self.openai_client = openai_client
+        self.llm_cache = llm_cache
+        self.model = (api_config and api_config.model) or DEFAULT_MODEL
+        self.timeout = api_config.timeout_seconds if api_config else DEFAULT_TIMEOUT_SECONDS
+        self.max_concurrency = api_config.max_concurrent_requests if api_config else DEFAULT_MAX_CONCURRENCY
+        self.per_floor = api_config.per_floor if api_config else PerFloorAnalysisConfig()
+        self.summary_top_k = api_config.summary_top_k if api_config else DEFAULT_TOP_K
+        self.summary_token_budget = api_config.summary_token_budget if api_config else DEFAULT_TOKEN_BUDGET
         
     def clean_excel_data(self, sheets: dict) -> pd.DataFrame:
         """Clean and filter Excel data to remove empty rows."""
-        df_all = pd.DataFrame()
+        frames = [
+            df[df['Finding Details'].str.len() > MIN_FINDING_LENGTH].assign(Floor=sheet_name)
+            for sheet_name, df in sheets.items()
+            if 'Finding Details' in df.columns
+        ]
+        if not frames:
+            return pd.DataFrame()
+        # One concat for all sheets instead of one per sheet
+        return pd.concat(frames, ignore_index=True)
 
-        for sheet_name, df in sheets.items():
-            if 'Finding Details' in df.columns:
-                df_failures = df[df['Finding Details'].str.len() > 10]
-                df_failures.loc[:, 'Floor'] = sheet_name
-                df_all = pd.concat([df_all, df_failures], ignore_index=True)
-
-        return df_all
+    def load_remediations(self, excel_content: bytes) -> pd.DataFrame:
+        """
+        Read the findings of every floor sheet, the streaming equivalent of
+        clean_excel_data over all sheets. Only REMEDIATION_COLUMNS are read.
+        """
+        sheets = read_excel_columns(excel_content, REMEDIATION_COLUMNS, 'Finding Details',
+                                    min_length=MIN_FINDING_LENGTH)
+        frames = [df.assign(Floor=sheet_name) for sheet_name, df in sheets.items()]
+        if not frames:
+            return pd.DataFrame(columns=REMEDIATION_COLUMNS + ['Floor'])
+        return pd.concat(frames, ignore_index=True)
     
-    async def generate_finding_description(self, findings: pd.DataFrame) -> str:
-        findings_summary = findings['Failure'].value_counts().to_dict()
-        
+    async def generate_finding_description(self, findings: pd.DataFrame, bypass_cache: bool = False) -> str:
+        """
+        LLM analysis of the failure counts. bypass_cache skips the cache lookup,
+        the fresh answer still replaces the cached one.
+        """
+        findings_summary = self.summarize_failures(findings['Failure'])
+
         prompt = f"""
         Analyze these network findings and identify technical patterns:
-        {findings_summary}
+{format_summary(findings_summary)}
 
         Provide a short technical analysis focusing on:
         1. Most common issue types
@@ -45,73 +108,251 @@ class FindingsDocumentGenerator:
         Keep response under 100 words, use technical language.
         """
 
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4",
+        return await self._complete(prompt, 150, (findings_summary, PROMPT_VERSION), bypass_cache)
+
+    def summarize_failures(self, failures: pd.Series) -> dict:
+        """Failure counts for a prompt, near-duplicates clustered and cut to the summary budget"""
+        return compact_summary(failures.value_counts().to_dict(), self.summary_top_k, self.summary_token_budget)
+
+    async def _complete(self, prompt: str, max_tokens: int, cache_key_parts: tuple, bypass_cache: bool) -> str:
+        """
+        One chat completion, reused from the cache when there is one.
+        cache_key_parts is (summary, prompt version) of the prompt.
+        """
+        cache_key = None
+        if self.llm_cache is not None:
+            summary, prompt_version = cache_key_parts
+            cache_key = make_cache_key(summary, self.model, prompt_version)
+            if not bypass_cache:
+                # SQLite may wait on another worker's lock, keep that off the event loop
+                cached = await asyncio.to_thread(self.llm_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+
+        analysis = await create_chat_completion(
+            self.openai_client,
+            timeout=self.timeout,
+            max_concurrency=self.max_concurrency,
+            model=self.model,
             messages=[
-                {"role": "system", "content": "You are a CWNE wireless network engineer performing a site survey of a hospital."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
-            max_tokens=150
+            max_tokens=max_tokens
         )
-        
-        return response.choices[0].message.content
 
-    def create_output_html_table(self, df: pd.DataFrame) -> str:
-        table_html = get_findings_and_recommendations_table(col_width='50', col_width2='50')
-        floor_names = df['Floor'].unique()
+        if cache_key is not None and analysis:
+            await asyncio.to_thread(self.llm_cache.put, cache_key, analysis)
+        return analysis
+
+    def floor_prompt(self, floor_summary: dict) -> str:
+        words = max(20, self.per_floor.max_tokens_per_floor * 2 // 3)
+        return f"""
+        Analyze these network findings from one area of the site survey and identify technical patterns:
+{format_summary(floor_summary)}
+
+        Provide a short technical analysis focusing on:
+        1. Most common issue types
+        2. Potential root causes
+        3. One specific recommendation for this area
+
+        Keep response under {words} words, use technical language.
+        """
+
+    def group_floors_by_failures(self, df: pd.DataFrame) -> List[Tuple[dict, List[str]]]:
+        """
+        Compacted failure counts of every floor, floors with the same counts grouped together.
+        Returns [(summary, floors)] in order of first appearance. Floors without
+        failures are left out.
+        """
+        groups = {}
+        for floor, failures in df.groupby('Floor', sort=False)['Failure']:
+            summary = self.summarize_failures(failures)
+            if summary:
+                # Compacted summaries are already in a canonical order
+                groups.setdefault(tuple(summary.items()), (summary, []))[1].append(floor)
+        return list(groups.values())
+
+    async def generate_floor_analyses(self, df: pd.DataFrame, bypass_cache: bool = False) -> List[Paragraph]:
+        """
+        One analysis per distinct floor failure distribution, run concurrently.
+
+        Calls are admitted in floor order while their estimated prompt plus
+        completion tokens fit per_floor.token_budget. Calls still running after
+        per_floor.time_budget_seconds are cancelled. Floors left out for either
+        reason, or whose call failed, are listed at the end of the report.
+        """
+        config = self.per_floor
+        limiter = asyncio.Semaphore(config.max_concurrency)
+        remaining_tokens = config.token_budget
 
-        for floor in floor_names:
-            findings = df[df['Floor'] == floor]['Finding Details']
-            remediations = df[df['Floor'] == floor]['Remediation Detail']
+        async def analyze(summary: dict) -> str:
+            async with limiter:
+                return await self._complete(self.floor_prompt(summary), config.max_tokens_per_floor,
+                                            (summary, f'floor-{PROMPT_VERSION}-{config.max_tokens_per_floor}'),
+                                            bypass_cache)
 
-            findings_list = f'{floor}<ul>'
-            for finding in findings:
-                findings_list += f'<li>{finding}</li>'
-            findings_list += '</ul>'
+        tasks, skipped = [], []
+        for summary, floors in self.group_floors_by_failures(df):
+            cost = estimate_tokens(SYSTEM_PROMPT + self.floor_prompt(summary)) + config.max_tokens_per_floor
+            if cost > remaining_tokens:
+                skipped.extend(floors)
+                continue
+            remaining_tokens -= cost
+            tasks.append((asyncio.create_task(analyze(summary)), floors))
 
-            remediation_list = f'{floor}<ul>'
-            for remediation in remediations:
-                remediation_list += f'<li>{remediation}</li>'
-            remediation_list += '</ul>'
+        try:
+            if tasks:
+                await asyncio.wait([task for task, _ in tasks], timeout=config.time_budget_seconds)
+        finally:
+            # Over the time budget, or this report itself was cancelled
+            for task, _ in tasks:
+                task.cancel()
+
+        paragraphs = []
+        for task, floors in tasks:
+            if task.cancelled() or not task.done():
+                skipped.extend(floors)
+            elif task.exception() is not None:
+                logging.warning("Floor analysis failed for %s: %s", ', '.join(map(str, floors)), str(task.exception()))
+                skipped.extend(floors)
+            else:
+                paragraphs.append(Paragraph(runs=[
+                    Run(f"{', '.join(map(str, floors))}: ", bold=True),
+                    Run(task.result())
+                ]))
+
+        if skipped:
+            paragraphs.append(Paragraph(runs=[
+                Run('Not analyzed (budget exceeded or model unavailable): ', italic=True),
+                Run(', '.join(map(str, skipped)))
+            ]))
+        return paragraphs
+
+    def group_by_floor(self, df: pd.DataFrame) -> Dict[str, Tuple[Dict[str, int], Dict[str, int]]]:
+        """
+        Group findings and remediations by floor in one pass over the rows.
+
+        Returns {floor: (findings, remediations)}, where findings and remediations
+        map each distinct text to its number of occurrences. Floors and texts keep
+        the order in which they first appear.
+        """
+        floors = {}
+        for floor, finding, remediation in zip(df['Floor'], df['Finding Details'], df['Remediation Detail']):
+            findings, remediations = floors.setdefault(floor, ({}, {}))
+            finding = str(finding).strip()
+            findings[finding] = findings.get(finding, 0) + 1
+            remediation = str(remediation).strip()
+            remediations[remediation] = remediations.get(remediation, 0) + 1
+        return floors
+
+    @staticmethod
+    def _counted(items: Dict[str, int]) -> List[str]:
+        """List entries, repeated entries shown once with their count"""
+        return [text if count == 1 else f'{text} (x{count})' for text, count in items.items()]
+
+    def create_output_table_block(self, df: pd.DataFrame) -> Table:
+        """The findings and recommendations table, one row per floor"""
+        table = get_findings_and_recommendations_table_block(col_width='50', col_width2='50')
+
+        for floor, (findings, remediations) in self.group_by_floor(df).items():
+            table.rows.append(get_findings_and_recommendations_row_block(
+                Cell(runs=text_runs(floor), bullets=self._counted(findings)),
+                Cell(runs=text_runs(floor), bullets=self._counted(remediations))
+            ))
 
-            table_html += get_findings_and_recommendations_row(findings_list, remediation_list)
+        return table
 
-        table_html += '</table>'
-        return table_html
+    def create_output_html_table(self, df: pd.DataFrame) -> str:
+        """HTML version of create_output_table_block"""
+        parts = [get_findings_and_recommendations_table(col_width='50', col_width2='50')]
+
+        for floor, (findings, remediations) in self.group_by_floor(df).items():
+            findings_list = ''.join([f'{floor}<ul>', *(f'<li>{finding}</li>' for finding in self._counted(findings)), '</ul>'])
+            remediation_list = ''.join([f'{floor}<ul>', *(f'<li>{remediation}</li>' for remediation in self._counted(remediations)), '</ul>'])
+            parts.append(get_findings_and_recommendations_row(findings_list, remediation_list))
+
+        parts.append('</table>')
+        return ''.join(parts)
     
-    async def generate_findings_report(self, df_remediations: pd.DataFrame) -> str:
-        analysis = await self.generate_finding_description(df_remediations)
+    async def generate_findings_report(self, df_remediations: pd.DataFrame, bypass_cache: bool = False):
+        """
+        The AI analysis of the findings: a text for the whole workbook, or
+        paragraphs per floor when per-floor analysis is enabled.
+        """
+        if self.per_floor.enabled:
+            return await self.generate_floor_analyses(df_remediations, bypass_cache)
+        analysis = await self.generate_finding_description(df_remediations, bypass_cache)
         return analysis
 
     async def build_docx_output_in_json_format(self, json_data: str) -> str:
+        """JSON wrapper of build_docx_output_bytes, with base64 workbook and template content."""
         json_dict = json.loads(json_data)
-        docx_output_template_content_base64 = json_dict['output_template_content']
-        
-        excel_input_content_base64 = json_dict['excel_content']
-        excel_sheets = convert_base64_to_excel_sheets(excel_input_content_base64)
-        
-        df_remediations = self.clean_excel_data(excel_sheets)
-        remediation_html_table = self.create_output_html_table(df_remediations)
-        llm_analysis = await self.generate_findings_report(df_remediations)
-
-        document = get_document(docx_output_template_content_base64)
-
-        html_sections = {
-            'remediation_table': remediation_html_table,
-            # wrap in <p> tags so html to docx conversion will work
-            'remediation_ai_report': f'<p>{llm_analysis}</p>'
-        }
-        replace_placeholders_in_docx(document, html_sections)
+        try:
+            excel_content = base64.b64decode(json_dict['excel_content'])
+        except Exception as e:
+            raise Exception(f"Error reading Excel from base64: {str(e)}")
+        output_template_content = base64.b64decode(json_dict['output_template_content'])
 
-        new_content = convert_doc_to_base64(document)
+        new_content = await self.build_docx_output_bytes(excel_content, output_template_content)
 
         response_data = {
-            "new_document_content": new_content
+            "new_document_content": base64.b64encode(new_content).decode("utf-8")
         }
         
         return json.dumps(response_data)
 
+    async def build_docx_output_bytes(self, excel_content: bytes, output_template_content: bytes,
+                                      bypass_cache: bool = False) -> bytes:
+        """
+        Build the remediation document from the raw workbook and template bytes, returning .docx bytes.
+        bypass_cache asks the model again instead of reusing a cached analysis.
+        """
+        # The template does not depend on the workbook, decode both at once.
+        # CPU bound steps run in worker threads so the event loop stays free.
+        template_task = asyncio.create_task(asyncio.to_thread(template_cache.get, output_template_content))
+        try:
+            df_remediations = await asyncio.to_thread(self.load_remediations, excel_content)
+        except BaseException:
+            await discard_tasks(template_task)
+            raise
+
+        # The model only needs the findings, start it before rendering anything
+        analysis_task = asyncio.create_task(self.generate_findings_report(df_remediations, bypass_cache))
+        try:
+            template = await template_task
+            document, ai_report_hits = await asyncio.to_thread(
+                self.render_remediation_table, template, df_remediations
+            )
+        except BaseException:
+            # Nothing waits for the model once rendering has failed
+            await discard_tasks(template_task, analysis_task)
+            raise
+        llm_analysis = await analysis_task
+
+        return await asyncio.to_thread(self.finish_document, document, ai_report_hits, llm_analysis)
+
+    def render_remediation_table(self, template, df_remediations: pd.DataFrame):
+        """
+        Fill the table placeholder of a parsed template. Returns the document and
+        the AI report placeholders, located before the table shifted the body.
+        """
+        document = template.document
+        hits = locate_placeholders(document, (TABLE_PLACEHOLDER, AI_REPORT_PLACEHOLDER), template.placeholder_index)
+        replace_placeholders_in_docx(
+            document, {TABLE_PLACEHOLDER: [self.create_output_table_block(df_remediations)]}, hits=hits
+        )
+        return document, [hit for hit in hits if hit[1] == AI_REPORT_PLACEHOLDER]
+
+    def finish_document(self, document: Document, ai_report_hits: list, llm_analysis) -> bytes:
+        """Splice the AI section in last and serialize the document"""
+        if isinstance(llm_analysis, str):
+            # wrap in <p> tags so html to docx conversion will work
+            llm_analysis = f'<p>{llm_analysis}</p>'
+        replace_placeholders_in_docx(document, {AI_REPORT_PLACEHOLDER: llm_analysis}, hits=ai_report_hits)
+        return convert_doc_to_bytes(document)
+
     async def process_request(self, req: func.HttpRequest) -> func.HttpResponse:
         logging.info('Python HTTP trigger function processed a request.')
 
@@ -129,11 +370,13 @@ class FindingsDocumentGenerator:
                 status_code=400
             )
 
-        json_request = json.dumps(json_data, indent=4)
-        json_response = await self.build_docx_output_in_json_format(json_request)
+        new_content = await self.build_docx_output_bytes(
+            base64.b64decode(json_data['excel_content']),
+            base64.b64decode(json_data['output_template_content'])
+        )
 
         return func.HttpResponse(
-            json_response,
+            json.dumps({"new_document_content": base64.b64encode(new_content).decode("utf-8")}),
             mimetype="application/json",
             status_code=200
         )
\ No newline at end of file
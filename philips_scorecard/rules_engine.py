@@ -0,0 +1,301 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# numpy and pandas are only imported by evaluate_rules, the single submission
+# path of the scorecard runs without them
+
+PASS = 'PASS'
+FAIL = 'FAIL'
+
+# Answer codes and justification states index a rule's compiled outcome tuple
+ANSWERS = ('yes', 'no', 'other')
+NO_JUSTIFICATION_COLUMN, NOT_JUSTIFIED, JUSTIFIED = 0, 1, 2
+JUSTIFICATION_STATES = 3
+
+# Rows of dbo.philips_rule_decisions: (rule_id, answer, justified, outcome).
+# answer is 'yes', 'no' or 'other' (anything else, including unanswered),
+# justified is 'yes', 'no' or None for either. These are the decisions that were
+# hardcoded in process_form_data and are used until the table is deployed
+# (see sql/philips_rule_decisions.sql).
+DEFAULT_DECISIONS = [
+    ('bp_4_3', 'yes', 'yes', PASS),
+    ('bp_4_3', 'yes', 'no', FAIL),
+    ('bp_4_3', 'no', None, PASS),
+    ('bp_4_4', 'yes', None, FAIL),
+    ('bp_4_4', 'no', None, PASS),
+    ('bp_4_5', 'yes', None, PASS),
+    ('bp_4_5', 'no', 'yes', PASS),
+    ('bp_4_5', 'no', 'no', FAIL),
+    ('bp_4_5', 'other', 'yes', PASS),
+    ('bp_4_5', 'other', 'no', FAIL),
+    # Are All SSID in the WLAN being broadcast?
+    ('bp_8_3', 'yes', None, PASS),
+    ('bp_8_3', 'no', 'yes', PASS),
+    ('bp_8_3', 'no', 'no', FAIL),
+    ('bp_8_3', 'other', 'yes', PASS),
+    ('bp_8_3', 'other', 'no', FAIL),
+    # Is AES/CCMP encryption in use on all SSIDs?
+    ('bp_9_1', 'yes', None, PASS),
+    ('bp_9_1', 'no', 'yes', PASS),
+    ('bp_9_1', 'no', 'no', FAIL),
+    ('bp_9_1', 'other', 'yes', PASS),
+    ('bp_9_1', 'other', 'no', FAIL),
+]
+DECISION_COLUMNS = ['rule_id', 'answer', 'justified', 'outcome']
+RULE_COLUMNS = ['rule_no', 'rule_id', 'bp_section', 'question', 'question_category',
+                'finding', 'recommendation', 'on_yes', 'on_no']
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """One row of dbo.philips_rules, only the columns the scorecard reads"""
+    rule_no: Any
+    rule_id: str
+    bp_section: Any
+    question: Any
+    question_category: Any
+    finding: Any
+    recommendation: Any
+    on_yes: Any
+    on_no: Any
+
+    @classmethod
+    def from_record(cls, record: Mapping) -> 'Rule':
+        """A rule from a {column: value} row, with its rule id lowercased"""
+        values = {column: record.get(column) for column in RULE_COLUMNS}
+        values['rule_id'] = str(values['rule_id']).lower()
+        return cls(**values)
+
+
+@dataclass(slots=True)
+class RuleResult:
+    """A rule evaluated against one submission"""
+    rule: Rule
+    answer: Any
+    meets: bool
+
+    @property
+    def id(self) -> str:
+        return self.rule.rule_id
+
+    @property
+    def category(self):
+        return self.rule.bp_section
+
+    @property
+    def message(self):
+        return self.rule.question
+
+    @property
+    def question_category(self):
+        return self.rule.question_category
+
+    @property
+    def findings(self):
+        return self.rule.finding
+
+    @property
+    def recommendations(self):
+        return self.rule.recommendation
+
+    @property
+    def meets_requirements(self) -> str:
+        return 'Yes' if self.meets else 'No'
+
+
+class DecisionTable:
+    """
+    Compiled pass/fail lookup for every rule.
+
+    Each rule maps to a flat tuple of booleans indexed by
+    answer code * JUSTIFICATION_STATES + justification state, so evaluating a
+    rule is a single lookup.
+    """
+
+    def __init__(self, outcomes: Dict[str, Tuple[bool, ...]]):
+        self.outcomes = outcomes
+        self._arrays = {}
+
+    def meets(self, rule_id: str, answer_code: int, justification_state: int) -> bool:
+        return self.outcomes[rule_id][answer_code * JUSTIFICATION_STATES + justification_state]
+
+    def as_array(self, rule_ids: list) -> 'np.ndarray':
+        """(len(rule_ids), 9) boolean array of the compiled outcomes, cached per rule list."""
+        import numpy as np
+        key = tuple(rule_ids)
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.array([self.outcomes[rule_id] for rule_id in rule_ids], dtype=bool)
+            array = array.reshape(len(rule_ids), len(ANSWERS) * JUSTIFICATION_STATES)
+            self._arrays[key] = array
+        return array
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _records(table, columns: list) -> List[dict]:
+    """Rows of a DataFrame, of dicts, of tuples in `columns` order or of records like Rule, as dicts"""
+    if hasattr(table, 'to_dict'):
+        return table[columns].to_dict('records')
+    records = []
+    for row in table:
+        if isinstance(row, Mapping):
+            records.append({column: row.get(column) for column in columns})
+        elif isinstance(row, tuple):
+            records.append(dict(zip(columns, row)))
+        else:
+            records.append({column: getattr(row, column) for column in columns})
+    return records
+
+
+def compile_decision_table(rules_df, decisions_df=None) -> DecisionTable:
+    """
+    Compile the rules and their decision rows into a DecisionTable.
+
+    Rules start from their on_yes/on_no columns: a 'yes' needs a justification when
+    the submissions have a '<rule_id>_justified' column, and any answer other than
+    'yes'/'no' passes. Decision rows then override individual cells.
+
+    Args:
+        rules_df: Rules with lowercased 'rule_id', 'on_yes' and 'on_no', as a
+            DataFrame or a sequence of Rule records
+        decisions_df: Rows with DECISION_COLUMNS, as a DataFrame or a sequence of
+            dicts or tuples, DEFAULT_DECISIONS if None
+    """
+    if decisions_df is None:
+        decisions_df = DEFAULT_DECISIONS
+
+    outcomes = {}
+    for rule in _records(rules_df, ['rule_id', 'on_yes', 'on_no']):
+        on_yes = rule['on_yes'] == PASS
+        on_no = rule['on_no'] == PASS
+        outcomes[rule['rule_id']] = [
+            on_yes, False, True,     # yes: without column, not justified, justified
+            on_no, on_no, on_no,     # no
+            True, True, True,        # other
+        ]
+
+    for decision in _records(decisions_df, DECISION_COLUMNS):
+        rule_id = str(decision['rule_id']).lower()
+        answer = str(decision['answer']).lower()
+        justified = decision['justified']
+        justified = None if _is_missing(justified) else str(justified).lower()
+        outcome = str(decision['outcome']).upper()
+
+        if rule_id not in outcomes:
+            continue
+        if answer not in ANSWERS or justified not in ('yes', 'no', None) or outcome not in (PASS, FAIL):
+            raise Exception(f"Invalid rule decision: {decision}")
+
+        if justified == 'yes':
+            states = (JUSTIFIED,)
+        elif justified == 'no':
+            states = (NO_JUSTIFICATION_COLUMN, NOT_JUSTIFIED)
+        else:
+            states = (NO_JUSTIFICATION_COLUMN, NOT_JUSTIFIED, JUSTIFIED)
+
+        offset = ANSWERS.index(answer) * JUSTIFICATION_STATES
+        for state in states:
+            outcomes[rule_id][offset + state] = outcome == PASS
+
+    return DecisionTable({rule_id: tuple(values) for rule_id, values in outcomes.items()})
+
+
+def _lowered(df: 'pd.DataFrame') -> 'np.ndarray':
+    """str(value).lower() of every cell, computed column-wise."""
+    import numpy as np
+    if df.shape[1] == 0:
+        return np.empty(df.shape, dtype=str)
+    return np.char.lower(df.astype(str).to_numpy(dtype=str))
+
+
+def evaluate_rules(forms_df: 'pd.DataFrame', rules_df: 'pd.DataFrame',
+                   decision_table: Optional[DecisionTable] = None) -> 'pd.DataFrame':
+    """
+    Evaluate every rule against every submission in one pass.
+
+    Args:
+        forms_df (pd.DataFrame): N form submissions, one column per rule id
+        rules_df (pd.DataFrame): M rules with 'rule_id', 'on_yes' and 'on_no'
+        decision_table (DecisionTable): Compiled decisions, compiled from rules_df if None
+
+    Returns:
+        pd.DataFrame: Boolean meets-requirements matrix indexed like forms_df with one
+        column per rule present in the submissions, in rules_df order.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if decision_table is None:
+        decision_table = compile_decision_table(rules_df)
+
+    rules = rules_df[rules_df['rule_id'].isin(forms_df.columns)]
+    rule_ids = rules['rule_id'].tolist()
+
+    answers = _lowered(forms_df[rule_ids])
+    answer_codes = np.where(answers == 'yes', 0, np.where(answers == 'no', 1, 2))
+
+    justification_keys = [f"{rule_id}_justified" for rule_id in rule_ids]
+    has_column = np.array([key in forms_df.columns for key in justification_keys], dtype=bool)
+    justification_states = np.full(answers.shape, NO_JUSTIFICATION_COLUMN)
+    if has_column.any():
+        present = [key for key in justification_keys if key in forms_df.columns]
+        justification_states[:, has_column] = np.where(
+            _lowered(forms_df[present]) == 'yes', JUSTIFIED, NOT_JUSTIFIED
+        )
+
+    table = decision_table.as_array(rule_ids)
+    index = answer_codes * JUSTIFICATION_STATES + justification_states
+    meets = table[np.arange(len(rule_ids)), index]
+    return pd.DataFrame(meets, index=forms_df.index, columns=rule_ids)
+
+
+def _answer_code(answer) -> int:
+    lowered = str(answer).lower()
+    return 0 if lowered == 'yes' else 1 if lowered == 'no' else 2
+
+
+def evaluate_submission(submission: Mapping, rules: Sequence[Rule],
+                        decision_table: Optional[DecisionTable] = None) -> List[RuleResult]:
+    """
+    Evaluate the rules against a single submission, without pandas.
+
+    Same decisions as evaluate_rules, one lookup per rule. Rules without an
+    answer column in the submission are left out.
+
+    Args:
+        submission (Mapping): {column: value} row of dbo.philips_form_submission
+        rules (Sequence[Rule]): Rules in report order
+        decision_table (DecisionTable): Compiled decisions, compiled from rules if None
+
+    Returns:
+        List[RuleResult]: One result per rule present in the submission, in rules order.
+    """
+    if decision_table is None:
+        decision_table = compile_decision_table(rules)
+
+    results = []
+    for rule in rules:
+        rule_id = rule.rule_id
+        if rule_id not in submission:
+            continue
+        answer = submission[rule_id]
+
+        justification_key = f"{rule_id}_justified"
+        if justification_key not in submission:
+            justification_state = NO_JUSTIFICATION_COLUMN
+        elif str(submission[justification_key]).lower() == 'yes':
+            justification_state = JUSTIFIED
+        else:
+            justification_state = NOT_JUSTIFIED
+
+        meets = decision_table.meets(rule_id, _answer_code(answer), justification_state)
+        results.append(RuleResult(rule, answer, meets))
+    return results
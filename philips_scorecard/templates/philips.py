@@ -1,3 +1,6 @@
+from dataclasses import replace
+from philips_scorecard.utils.docx_blocks import Table, Row, Cell, Run, text_runs
+
 
 RED = "#ffb2b5"
 GREEN = "#b0e396"
@@ -98,4 +101,79 @@ def get_progress_bar_table(passing_results, total_results):
                     </td>
                 </tr>
             </table>
-        """
\ No newline at end of file
+        """
+
+# Structured equivalents of the HTML templates above. They render to the same
+# docx output without the HTML being built and parsed again.
+BORDER_COLOR = "c1c6cc"
+WHITE = "ffffff"
+
+def _hex(color: str) -> str:
+    return color.replace('#', '').strip()
+
+def _header_cell(runs: list, align: str = None) -> Cell:
+    return Cell(runs=runs, border=True, background=WHITE, align=align)
+
+def get_table_block() -> Table:
+    return Table(
+        rows=[Row(cells=[
+            _header_cell([Run('Category')]),
+            _header_cell([Run('Message')]),
+            _header_cell([Run('Answer')], align='center'),
+            _header_cell([Run('Meets'), Run(line_break=True), Run('Requirement')], align='center'),
+        ])],
+        col_widths=[25.0, 50.0, 10.0, 15.0],
+        border_color=BORDER_COLOR
+    )
+
+def get_row_block(bgcolor: str, result) -> Row:
+    """Requirement row of a rules_engine.RuleResult"""
+    return Row(cells=[
+        Cell(runs=text_runs(result.question_category), border=True),
+        Cell(runs=text_runs(result.message), border=True),
+        Cell(runs=text_runs(result.answer), border=True, align='center'),
+        Cell(runs=text_runs(result.meets_requirements), border=True, background=_hex(bgcolor), align='center'),
+    ])
+
+def get_findings_and_recommendations_table_block(col_width: str = '50', col_width2: str = '50') -> Table:
+    return Table(
+        rows=[Row(cells=[
+            _header_cell([Run('Finding(s)')]),
+            _header_cell([Run('Recommendation(s)')]),
+        ])],
+        col_widths=[float(col_width), float(col_width2)],
+        border_color=BORDER_COLOR
+    )
+
+def get_findings_and_recommendations_row_block(findings, recommendations) -> Row:
+    """
+    Findings and recommendations are either plain values or Cell objects,
+    e.g. a floor name with a bulleted list.
+    """
+    def cell(content) -> Cell:
+        if isinstance(content, Cell):
+            return replace(content, border=True)
+        return Cell(runs=text_runs(content), border=True)
+
+    return Row(cells=[cell(findings), cell(recommendations)])
+
+def get_progress_bar_table_block(passing_results, total_results) -> Table:
+    """Structured version of get_progress_bar_table."""
+    pass_percentage = (passing_results / total_results * 100) if total_results > 0 else 0
+    progress_width = f"{pass_percentage:.0f}"
+    not_progress_width = f"{100 - pass_percentage:.0f}"
+
+    # If 100%, only create one cell. That table has no border color of its own.
+    if pass_percentage == 100:
+        return Table(rows=[Row(cells=[
+            Cell(runs=[Run('100%', bold=True)], border=True, background=_hex(GREEN), align='center')
+        ])])
+    else:
+        return Table(
+            rows=[Row(cells=[
+                Cell(runs=[Run(f'{progress_width}%', bold=True)], border=True, background=_hex(GREEN), align='center'),
+                Cell(border=True, background=WHITE),
+            ])],
+            col_widths=[float(progress_width), float(not_progress_width)],
+            border_color=BORDER_COLOR
+        )
@@ -1,8 +1,16 @@
 import base64
+import copy
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
 from io import BytesIO
+from typing import List
 from docx import Document
 import io
-import pandas as pd
+# pandas is only needed for workbooks, the scorecard path never imports it
+from philips_scorecard.utils.insert_html_to_docx import index_placeholders
 
 def word_to_base64(file_path : str) -> str:
     """
@@ -43,6 +51,8 @@ def excel_to_base64(file_path: str) -> str:
     Returns:
         str: Base64 encoded string of the Excel file
     """
+    import pandas as pd
+
     try:
         # Create a bytes buffer
         buffer = io.BytesIO()
@@ -68,23 +78,124 @@ def excel_to_base64(file_path: str) -> str:
         buffer.close()
 
 def convert_doc_to_base64(document : Document) -> str:
-    # Save updated document to a BytesIO buffer
+    # Encode modified document to base64. This would return in the HTTP request normally
+    return base64.b64encode(convert_doc_to_bytes(document)).decode("utf-8")
+
+def convert_doc_to_bytes(document : Document) -> bytes:
+    """Serialize a document to .docx bytes"""
     output = BytesIO()
     document.save(output)
-    output.seek(0)
+    return output.getvalue()
 
-    # Encode modified document to base64. This would return in the HTTP request normally
-    content = base64.b64encode(output.read()).decode("utf-8")
 
-    return content
+@dataclass
+class ParsedTemplate:
+    document: Document
+    # index_placeholders() of the template, valid for every copy handed out
+    placeholder_index: list
+
+
+class TemplateCache:
+    """
+    LRU cache of parsed Word templates keyed by a hash of their bytes.
+
+    Power Automate sends the same template on almost every request, so the zip
+    and XML parsing is done once and each request gets a deep copy of the
+    cached document instead. The memory cap is measured in uncompressed
+    template size, a close proxy for the size of the parsed XML.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # digest -> (ParsedTemplate, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, document_content: bytes) -> ParsedTemplate:
+        """Return a private copy of the parsed template for these bytes."""
+        digest = hashlib.sha256(document_content).digest()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+
+        if entry is None:
+            template = ParsedTemplate(*self._parse(document_content))
+            size = self._uncompressed_size(document_content)
+            entry = (template, size)
+            with self._lock:
+                self.misses += 1
+                if digest not in self._entries and size <= self.max_bytes:
+                    self._entries[digest] = entry
+                    self._total_bytes += size
+                    self._evict_locked()
+
+        template = entry[0]
+        return ParsedTemplate(clone_document(template.document), template.placeholder_index)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _evict_locked(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._total_bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _parse(document_content: bytes):
+        document = Document(BytesIO(document_content))
+        return document, index_placeholders(document)
+
+    @staticmethod
+    def _uncompressed_size(document_content: bytes) -> int:
+        try:
+            with zipfile.ZipFile(BytesIO(document_content)) as archive:
+                return sum(info.file_size for info in archive.infolist())
+        except zipfile.BadZipFile:
+            return len(document_content)
+
+
+# Shared by every request handled by this worker process
+template_cache = TemplateCache()
+
+
+def get_template(document_content_base64) -> ParsedTemplate:
+    """Decode a base64 Word template and return a private parsed copy with its placeholder index."""
+    document_content = base64.b64decode(document_content_base64)
+    return template_cache.get(document_content)
 
 
 def get_document(document_content_base64):
     # The base64 content of the Word document is transmitted in the HTTP Post
     # It then has to be decoded, and then the placeholders can be replaced
-    document_content = base64.b64decode(document_content_base64)
-    document = Document(BytesIO(document_content))
-    return document
+    return get_template(document_content_base64).document
+
+def clone_document(document : Document) -> Document:
+    """
+    Deep copy a parsed document so one parsed template can be filled in many times.
+    Copying the XML trees is much cheaper than unzipping and parsing the template again.
+    """
+    return copy.deepcopy(document)
 
 def convert_base64_to_excel_sheets(base64_content: str) -> dict:
     """
@@ -99,13 +210,101 @@ def convert_base64_to_excel_sheets(base64_content: str) -> dict:
     try:
         # Decode base64 to bytes
         excel_bytes = base64.b64decode(base64_content)
-        
+    except Exception as e:
+        raise Exception(f"Error reading Excel from base64: {str(e)}")
+    return convert_bytes_to_excel_sheets(excel_bytes)
+
+def convert_bytes_to_excel_sheets(excel_bytes: bytes) -> dict:
+    """
+    Reads the raw bytes of an Excel file with pandas
+
+    Parameters:
+    excel_bytes (bytes): Content of the .xlsx file
+
+    Returns:
+    dict: Dictionary of all sheets in the Excel file (dictionary of DataFrames)
+    """
+    import pandas as pd
+
+    try:
         # Create a BytesIO object (in-memory file)
         excel_buffer = io.BytesIO(excel_bytes)
-        
+
         # Read Excel file using pandas
         sheets = pd.read_excel(excel_buffer, sheet_name=None)
-        
+
         return sheets
     except Exception as e:
         raise Exception(f"Error reading Excel from base64: {str(e)}")
+
+def read_excel_columns(excel_bytes: bytes, columns: List[str], required_column: str,
+                       min_length: int = 0) -> dict:
+    """
+    Read selected columns of every sheet in one read-only streaming pass.
+
+    Only the header row of a sheet is read to decide whether it is used, sheets
+    whose header lacks `required_column` are skipped. Rows are kept only if their
+    `required_column` cell is text longer than `min_length`, and are filtered
+    while reading instead of after building a DataFrame of the whole sheet.
+    Values are kept as stored, empty and error cells (#REF! etc.) become NaN
+    like pandas reads them.
+
+    Parameters:
+    excel_bytes (bytes): Content of the .xlsx file
+    columns (list): Header names of the columns to return, must include required_column
+    required_column (str): Header a sheet must have to be read
+    min_length (int): Minimum text length, exclusive, of the required cell
+
+    Returns:
+    dict: Dictionary of sheet name to DataFrame with `columns`
+    """
+    # Only the remediation route reads workbooks
+    import numpy as np
+    import pandas as pd
+    import openpyxl
+    from openpyxl.cell.cell import ERROR_CODES
+
+    try:
+        workbook = openpyxl.load_workbook(BytesIO(excel_bytes), read_only=True, data_only=True, keep_links=False)
+    except Exception as e:
+        raise Exception(f"Error reading Excel: {str(e)}")
+
+    try:
+        sheets = {}
+        for worksheet in workbook.worksheets:
+            # Read-only sheets trust the stored dimensions, which are often wrong
+            worksheet.reset_dimensions()
+
+            # The header is the first non-empty row, like pandas
+            header, header_row = None, 0
+            for header_row, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                if any(value is not None for value in row):
+                    header = row
+                    break
+            if header is None or required_column not in header:
+                continue
+
+            positions = [header.index(column) if column in header else None for column in columns]
+            present = [position for position in positions if position is not None]
+            first, last = min(present), max(present)
+            required = header.index(required_column) - first
+            offsets = [position - first if position is not None else None for position in positions]
+
+            records = []
+            for row in worksheet.iter_rows(min_row=header_row + 1, min_col=first + 1, max_col=last + 1,
+                                           values_only=True):
+                value = row[required] if required < len(row) else None
+                if not isinstance(value, str) or len(value) <= min_length:
+                    continue
+                record = []
+                for offset in offsets:
+                    cell = row[offset] if offset is not None and offset < len(row) else None
+                    record.append(np.nan if cell is None or cell in ERROR_CODES else cell)
+                records.append(record)
+
+            sheets[worksheet.title] = pd.DataFrame(records, columns=columns, dtype=object)
+        return sheets
+    except Exception as e:
+        raise Exception(f"Error reading Excel: {str(e)}")
+    finally:
+        workbook.close()
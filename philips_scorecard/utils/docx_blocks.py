@@ -0,0 +1,60 @@
+"""
+Structured intermediate form for report content.
+
+The scorecard builders emit these blocks and insert_html_to_docx.render_blocks
+turns them into docx elements directly. HTML input is parsed into the same
+blocks by insert_html_to_docx.html_to_blocks, so both paths render identically.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class Run:
+    text: str = ''
+    bold: bool = False
+    italic: bool = False
+    # A <br>: an empty run holding a line break
+    line_break: bool = False
+
+
+@dataclass
+class Cell:
+    # Runs of the cell's first paragraph
+    runs: List[Run] = field(default_factory=list)
+    # Each bullet is rendered as its own indented paragraph after the first one
+    bullets: List[str] = field(default_factory=list)
+    border: bool = False
+    # Hex colors without the leading '#'
+    background: Optional[str] = None
+    color: Optional[str] = None
+    # 'center', 'right' or None for the default left alignment
+    align: Optional[str] = None
+
+
+@dataclass
+class Row:
+    cells: List[Cell] = field(default_factory=list)
+
+
+@dataclass
+class Table:
+    rows: List[Row] = field(default_factory=list)
+    # Percent of the page width per column, None leaves the column as created
+    col_widths: List[Optional[float]] = field(default_factory=list)
+    border_color: Optional[str] = None
+
+    @property
+    def cols(self) -> int:
+        return max((len(row.cells) for row in self.rows), default=0)
+
+
+@dataclass
+class Paragraph:
+    runs: List[Run] = field(default_factory=list)
+
+
+def text_runs(value) -> List[Run]:
+    """Runs for a value placed straight into a cell, trimmed the way HTML cell text is."""
+    text = str(value).rstrip('\n')
+    return [Run(text)] if text else []
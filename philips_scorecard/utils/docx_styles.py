@@ -0,0 +1,150 @@
+"""
+Compiled style layer for the docx renderer.
+
+Reports repeat a handful of distinct inline CSS strings and cell formats.
+Each distinct CSS string is parsed once into a CellStyle, and each distinct
+combination of cell or run properties is turned into its WordprocessingML
+fragment once. Rendering a cell is then a few cache lookups and string joins.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from xml.sax.saxutils import escape
+
+BORDER_PROPERTIES = ('border', 'border-top', 'border-left', 'border-bottom', 'border-right')
+BORDER_EDGES = ('top', 'left', 'bottom', 'right')
+ALIGN_VALUES = ('center', 'right')
+
+# Distinct styles seen per process are few, these bounds only guard against
+# unbounded growth from generated styles
+STYLE_CACHE_SIZE = 256
+FRAGMENT_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class CellStyle:
+    border: bool = False
+    # Hex colors without the leading '#'
+    background: Optional[str] = None
+    color: Optional[str] = None
+    align: Optional[str] = None
+
+
+def parse_css(style):
+    """Parse an inline CSS string into a property dict"""
+    return dict(s.strip().split(':') for s in style.split(';')
+                if ':' in s and s.strip())
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def compile_cell_style(style: str) -> CellStyle:
+    """The docx properties of a td/th style attribute, parsed once per distinct string"""
+    styles = parse_css(style)
+    align = styles['text-align'].strip() if 'text-align' in styles else None
+    return CellStyle(
+        # Borders only if specified
+        border=any(border_prop in styles for border_prop in BORDER_PROPERTIES),
+        background=styles['background-color'].replace('#', '').strip() if 'background-color' in styles else None,
+        color=styles['color'].replace('#', '').strip() if 'color' in styles else None,
+        align=align if align in ALIGN_VALUES else None
+    )
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def compile_row_background(style: str) -> Optional[str]:
+    """Background color of a tr style attribute, used by cells without their own"""
+    bg_color = next((s.split(':')[1].strip() for s in style.split(';')
+                     if 'background-color' in s), None)
+    return bg_color.replace('#', '').strip() if bg_color else None
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def compile_table_border_color(style: str) -> Optional[str]:
+    """Border color of a table style attribute like "border:1px solid #4A5568" """
+    table_styles = parse_css(style)
+    if 'border' in table_styles:
+        border_parts = table_styles['border'].split()
+        if len(border_parts) >= 3 and border_parts[2].startswith('#'):
+            return border_parts[2].replace('#', '')
+    return None
+
+
+def xml_attr(value) -> str:
+    return escape(str(value), {'"': '&quot;'})
+
+
+@lru_cache(maxsize=STYLE_CACHE_SIZE)
+def rgb_hex(color: str) -> str:
+    """Normalize a hex color to the uppercase form python-docx writes for RGBColor"""
+    return '%02X%02X%02X' % tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def borders_xml(border_color) -> str:
+    edges = ''.join(
+        f'<w:{edge} w:val="single" w:sz="4" w:space="0" w:color="{xml_attr(border_color)}"/>'
+        for edge in BORDER_EDGES
+    )
+    return f'<w:tcBorders>{edges}</w:tcBorders>'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def cell_properties_xml(width: int, border: bool, border_color, background: Optional[str]) -> str:
+    """w:tcPr of a table cell"""
+    properties = f'<w:tcW w:type="dxa" w:w="{width}"/>'
+    if border:
+        properties += borders_xml(border_color)
+    if background:
+        properties += f'<w:shd w:fill="{xml_attr(background)}"/>'
+    return f'<w:tcPr>{properties}</w:tcPr>'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def run_properties_xml(bold: bool, italic: bool, color: Optional[str]) -> str:
+    """w:rPr of a run, empty when the run has no formatting"""
+    properties = ''
+    if bold:
+        properties += '<w:b/>'
+    if italic:
+        properties += '<w:i/>'
+    if color:
+        properties += f'<w:color w:val="{color}"/>'
+    return f'<w:rPr>{properties}</w:rPr>' if properties else ''
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def paragraph_properties_xml(align: Optional[str]) -> str:
+    """w:pPr of a cell's first paragraph, empty for the default left alignment"""
+    return f'<w:pPr><w:jc w:val="{align}"/></w:pPr>' if align in ALIGN_VALUES else ''
+
+
+CACHED_FUNCTIONS = {
+    'cell_style': compile_cell_style,
+    'row_background': compile_row_background,
+    'table_border_color': compile_table_border_color,
+    'rgb_hex': rgb_hex,
+    'borders': borders_xml,
+    'cell_properties': cell_properties_xml,
+    'run_properties': run_properties_xml,
+    'paragraph_properties': paragraph_properties_xml,
+}
+
+
+def style_cache_stats() -> dict:
+    """Hits, misses and size of every style and fragment cache in this process"""
+    stats = {}
+    for name, function in CACHED_FUNCTIONS.items():
+        info = function.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'hit_rate': info.hits / lookups if lookups else 0.0
+        }
+    return stats
+
+
+def clear_style_caches():
+    for function in CACHED_FUNCTIONS.values():
+        function.cache_clear()
@@ -0,0 +1,109 @@
+"""
+Import-time report and budgets for cold starts.
+
+Each module is imported in a fresh interpreter with `python -X importtime`,
+so the numbers are what a new worker pays. Run from the project root:
+
+    python -m philips_scorecard.utils.import_profile
+    python -m philips_scorecard.utils.import_profile function_app --top 30
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Module -> (seconds allowed, top-level packages it must not import).
+# The times are generous ceilings for a slow worker, the forbidden packages
+# are what actually keeps a route's cold start small.
+IMPORT_BUDGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    'function_app': (0.5, ('pandas', 'numpy', 'docx', 'lxml', 'bs4', 'openai', 'pymssql', 'yaml', 'openpyxl')),
+    'philips_scorecard.build_scorecard': (2.0, ('pandas', 'numpy', 'openai', 'bs4', 'openpyxl')),
+    'philips_scorecard.remediation_list_generator': (2.0, ('openai', 'pymssql')),
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+@dataclass
+class ImportReport:
+    module: str
+    # (module, self microseconds, cumulative microseconds, nesting level) in import order
+    imports: List[Tuple[str, int, int, int]] = field(default_factory=list)
+
+    @property
+    def total_seconds(self) -> float:
+        return self.imports[-1][2] / 1e6 if self.imports else 0.0
+
+    @property
+    def packages(self) -> set:
+        """Top-level packages imported on the way"""
+        return {name.split('.')[0] for name, _, _, _ in self.imports}
+
+    def top(self, count: int = 15) -> List[Tuple[str, int, int, int]]:
+        """The slowest imports by cumulative time, direct imports of the module first on ties"""
+        return sorted(self.imports, key=lambda entry: (-entry[2], entry[3]))[:count]
+
+
+def measure_imports(module: str) -> ImportReport:
+    """Import a module in a fresh interpreter and parse its -X importtime output"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get('PYTHONPATH')])))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Error importing {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    # Keep the module and the imports nested under it, not the interpreter startup
+    end = max(i for i, entry in enumerate(imports) if entry[0] == module and entry[3] == 0)
+    start = end
+    while start > 0 and imports[start - 1][3] > 0:
+        start -= 1
+    return ImportReport(module, imports[start:end + 1])
+
+
+def check_budget(report: ImportReport, seconds: float, forbidden: Tuple[str, ...]) -> List[str]:
+    """Budget violations of a report, empty if it is within budget"""
+    violations = []
+    if report.total_seconds > seconds:
+        violations.append(f"{report.module} took {report.total_seconds:.3f}s to import, budget {seconds:.3f}s")
+    for package in sorted(report.packages & set(forbidden)):
+        violations.append(f"{report.module} imports {package}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report per module")
+    parser.add_argument('modules', nargs='*', default=list(IMPORT_BUDGETS))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        report = measure_imports(module)
+        print(f"{module}: {report.total_seconds:.3f}s")
+        for name, self_us, cumulative_us, level in report.top(args.top):
+            print(f"  {cumulative_us / 1000:9.1f} ms  {self_us / 1000:7.1f} ms self  {'  ' * level}{name}")
+        if module in IMPORT_BUDGETS:
+            violations = check_budget(report, *IMPORT_BUDGETS[module])
+            for violation in violations:
+                print(f"  OVER BUDGET: {violation}")
+            failed = failed or bool(violations)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,245 +1,355 @@
 from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import parse_xml
-from docx.oxml.ns import nsdecls
-from bs4 import BeautifulSoup
+from docx.shared import Emu, Inches, Pt
+from docx.oxml import parse_xml, OxmlElement
+from docx.oxml.ns import nsdecls, qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from philips_scorecard.utils import docx_blocks as blocks_model
+from philips_scorecard.utils.docx_styles import (
+    compile_cell_style, compile_row_background, compile_table_border_color,
+    rgb_hex, cell_properties_xml, run_properties_xml, paragraph_properties_xml
+)
 import os
+import re
+from xml.sax.saxutils import escape
 
-def set_cell_background(cell, hex_color):
-    """Set background color of a cell"""
-    cell._tc.get_or_add_tcPr().append(
-        parse_xml(f'<w:shd {nsdecls("w")} w:fill="{hex_color}"/>')
-    )
-
-def set_cell_border(cell, styles, border_color='4A5568'):
-    """Set cell borders with specified color"""
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
-    
-    # Create border elements
-    for edge in ['top', 'left', 'bottom', 'right']:
-        border = parse_xml(f'''<w:tcBorders xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
-                          <w:{edge} w:val="single" w:sz="4" w:space="0" w:color="{border_color}"/>
-                        </w:tcBorders>''')
-        tcPr.append(border)
-
-def set_table_width(table, width_percent=100):
-    """Set table width as percentage of page width"""
-    table.table_direction = 1  # Set table to left-to-right
-    table._tbl.xpath("./w:tblPr")[0].append(
-        parse_xml(f'<w:tblW xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:w="{width_percent*50}" w:type="pct"/>')
-    )
+def html_to_blocks(html_content):
+    """Parse HTML content into docx_blocks using BeautifulSoup"""
+    # Only HTML replacements need bs4, the scorecard sections are built as blocks
+    from bs4 import BeautifulSoup
 
-def set_cell_padding(table, padding_twips=120):  # 120 twips = ~8.5 points
-    """Set default cell padding for the table"""
-    tblPr = table._element.xpath('./w:tblPr')
-    if not tblPr:
-        tblPr = parse_xml('<w:tblPr xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>')
-        table._element.insert(0, tblPr)
-    else:
-        tblPr = tblPr[0]
-        
-    tblCellMar = parse_xml(f'''<w:tblCellMar xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
-        <w:top w:w="{padding_twips}" w:type="dxa"/>
-        <w:left w:w="{padding_twips}" w:type="dxa"/>
-        <w:bottom w:w="{padding_twips}" w:type="dxa"/>
-        <w:right w:w="{padding_twips}" w:type="dxa"/>
-    </w:tblCellMar>''')
-    tblPr.append(tblCellMar)
-
-def convert_html_to_docx_elements(doc, html_content):
-    """Convert HTML content to docx elements using BeautifulSoup"""
     soup = BeautifulSoup(html_content, 'html.parser')
-    added_elements = []
+    blocks = []
 
     for element in soup.children:
         if element.name == 'table':
-            # Create table
             rows = element.find_all('tr')
             if rows:
-                cols = max(len(row.find_all(['td', 'th'])) for row in rows)
-                table = doc.add_table(rows=len(rows), cols=cols)
-                added_elements.append(table)
-
-                # Set table to full width
-                set_table_width(table)
+                table = blocks_model.Table()
+                blocks.append(table)
 
-                # Set default cell padding
-                set_cell_padding(table)
-
-
-                # Get table styles including border color
-                table_style = element.get('style', '')
-                if table_style:
-                    table_styles = dict(s.strip().split(':') for s in table_style.split(';') 
-                                    if ':' in s and s.strip())
-                    border_color = None
-                    if 'border' in table_styles:
-                        # Extract color from border style like "1px solid #4A5568"
-                        border_parts = table_styles['border'].split()
-                        if len(border_parts) >= 3 and border_parts[2].startswith('#'):
-                            border_color = border_parts[2].replace('#', '')
+                # Border color from a table style like "border:1px solid #4A5568"
+                table.border_color = compile_table_border_color(element.get('style', ''))
 
                 # Get column widths from colgroup
-                col_widths = []
                 colgroup = element.find('colgroup')
                 if colgroup:
                     for col in colgroup.find_all('col'):
                         width = col.get('width', '').rstrip('%')
-                        col_widths.append(float(width) if width else None)
+                        table.col_widths.append(float(width) if width else None)
 
                 # Process each row
-                for i, row in enumerate(rows):
+                for row in rows:
                     # Get row background color
-                    bg_color = row.get('style', '')
-                    bg_color = next((s.split(':')[1].strip() for s in bg_color.split(';') 
-                                  if 'background-color' in s), None)
-
-                    cells = row.find_all(['td', 'th'])
-                    for j, cell in enumerate(cells):
-                        # Get cell styles
-                        cell_style = cell.get('style', '')
-                        styles = dict(s.strip().split(':') for s in cell_style.split(';') 
-                                   if ':' in s and s.strip())
-                        
-                        # Apply content and styling
-                        table_cell = table.cell(i, (cols - 1) - j)
-                        paragraph = table_cell.paragraphs[0]
-                        
+                    bg_color = compile_row_background(row.get('style', ''))
+
+                    table_row = blocks_model.Row()
+                    table.rows.append(table_row)
+
+                    for cell in row.find_all(['td', 'th']):
+                        # Get cell styles, compiled once per distinct style string
+                        style = compile_cell_style(cell.get('style', ''))
+                        table_cell = blocks_model.Cell(
+                            border=style.border,
+                            # Background color - cell first, then row
+                            background=style.background if style.background is not None else bg_color,
+                            color=style.color,
+                            align=style.align
+                        )
+                        table_row.cells.append(table_cell)
+
                         # Process cell contents for formatting
                         for content in cell.contents:
                             if isinstance(content, str):
                                 # Preserve spaces in text, only strip from ends if needed
                                 text = content.rstrip('\n')  # Remove newlines but keep spaces
                                 if text:  # Only add if there's content (including spaces)
-                                    run = paragraph.add_run(text)
+                                    table_cell.runs.append(blocks_model.Run(text))
                             elif content.name == 'b' or content.name == 'strong':
                                 # Bold text
-                                run = paragraph.add_run(content.get_text().strip())
-                                run.bold = True
+                                table_cell.runs.append(blocks_model.Run(content.get_text().strip(), bold=True))
                             elif content.name == 'br':
                                 # Add line break
-                                paragraph.add_run().add_break()
+                                table_cell.runs.append(blocks_model.Run(line_break=True))
                             elif content.name == 'ul':
                                 # Handle unordered lists within cells
                                 for li in content.find_all('li'):
-                                    # Create a new paragraph for each list item
-                                    list_para = table_cell.add_paragraph()
-                                    # Add bullet character and text with proper spacing
-                                    run = list_para.add_run('• ')
-                                    run.font.symbol = True
-                                    list_para.add_run(li.get_text().strip())
-                                    # Add left indentation for list items
-                                    list_para.paragraph_format.left_indent = Inches(0.25)
-                                    list_para.paragraph_format.first_line_indent = Inches(-0.25)
-
-                        # Apply borders only if specified
-                        if any(border_prop in styles for border_prop in ['border', 'border-top', 'border-left', 'border-bottom', 'border-right']):
-                            set_cell_border(table_cell, styles, border_color)
-                        
-                        # Apply background color - check cell first, then row
-                        if 'background-color' in styles:
-                            cell_bg = styles['background-color'].replace('#', '').strip()
-                            set_cell_background(table_cell, cell_bg)
-                        elif bg_color:  # fallback to row background if cell has none
-                            bg_color = bg_color.replace('#', '').strip()
-                            set_cell_background(table_cell, bg_color)
-                            
-                        # Apply text alignment
-                        if 'text-align' in styles:
-                            if styles['text-align'].strip() == 'center':
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            elif styles['text-align'].strip() == 'right':
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                        
-                        # Apply font color if specified
-                        if 'color' in styles:
-                            color = styles['color'].replace('#', '').strip()
-                            rgb = tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
-                            for run in paragraph.runs:
-                                run.font.color.rgb = RGBColor(*rgb)
-
-                # Apply column widths
-                if col_widths:
-                    for i, width in enumerate(col_widths):
-                        if width is not None:
-                            for cell in table.columns[(cols - 1) - i].cells:
-                                cell.width = Inches(width / 100 * 6)  # assuming 6 inches total width
+                                    table_cell.bullets.append(li.get_text().strip())
 
         elif element.name == 'p':
-            p = doc.add_paragraph()
-            added_elements.append(p)
-            
-            # Handle paragraph styling
-            p_style = element.get('style', '')
-            if p_style:
-                styles = dict(s.split(':') for s in p_style.split(';') 
-                            if ':' in s and s.strip())
-                
-                # Apply text color
-                if 'color' in styles:
-                    color = styles['color'].replace('#', '').strip()
-                    rgb = tuple(int(color[i:i+2], 16) for i in (0, 2, 4))
-                    for run in p.runs:
-                        run.font.color.rgb = RGBColor(*rgb)
-                
-                # Apply font style
-                if 'font-style' in styles and styles['font-style'].strip() == 'italic':
-                    for run in p.runs:
-                        run.italic = True
-            
+            # Paragraph styles are not applied: they used to be set before any
+            # run existed, so they never had an effect on the output.
+            paragraph = blocks_model.Paragraph()
+            blocks.append(paragraph)
+
             # Handle inline elements and their styling
             for child in element.children:
                 if child.name in ['b', 'strong']:
-                    run = p.add_run(child.get_text())
-                    run.bold = True
+                    paragraph.runs.append(blocks_model.Run(child.get_text(), bold=True))
                 elif child.name in ['i', 'em']:
-                    run = p.add_run(child.get_text())
-                    run.italic = True
+                    paragraph.runs.append(blocks_model.Run(child.get_text(), italic=True))
                 else:
                     text = child.string if child.string else child.get_text()
                     if text:
-                        p.add_run(text)
+                        paragraph.runs.append(blocks_model.Run(str(text)))
+
+    return blocks
+
+
+# Text characters python-docx turns into their own run content elements
+RUN_SPECIAL_CHARS = re.compile(r'([\t\r\n])')
+
+# Table properties of doc.add_table() with a right-to-left (bidiVisual), full-width table
+TABLE_PROPERTIES_XML = (
+    '<w:tblPr>'
+    '<w:bidiVisual/>'
+    '<w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+    'w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+    '<w:tblW w:w="5000" w:type="pct"/>'
+    '<w:tblCellMar>'
+    '<w:top w:w="120" w:type="dxa"/>'
+    '<w:left w:w="120" w:type="dxa"/>'
+    '<w:bottom w:w="120" w:type="dxa"/>'
+    '<w:right w:w="120" w:type="dxa"/>'
+    '</w:tblCellMar>'
+    '</w:tblPr>'
+)
+
+BULLET_PROPERTIES_XML = '<w:pPr><w:ind w:left="360" w:hanging="360"/></w:pPr>'
+BULLET_RUN_XML = '<w:r><w:t xml:space="preserve">\u2022 </w:t></w:r>'
 
 
+def _text_xml(text):
+    """Run content for text, the same elements python-docx's run.text setter creates"""
+    parts = []
+    for piece in RUN_SPECIAL_CHARS.split(text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            parts.append('<w:br/>')
+        elif piece:
+            if len(piece.strip()) < len(piece):
+                parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+            else:
+                parts.append(f'<w:t>{escape(piece)}</w:t>')
+    return ''.join(parts)
+
+
+def _run_xml(block_run, color=None):
+    if block_run.line_break:
+        # A line break run carries no text formatting, only the cell color
+        return f'<w:r>{run_properties_xml(False, False, color)}<w:br/></w:r>'
+    properties = run_properties_xml(block_run.bold, block_run.italic, color)
+    return f'<w:r>{properties}{_text_xml(block_run.text)}</w:r>'
+
+
+def _paragraph_xml(runs, align=None, color=None):
+    return f'<w:p>{paragraph_properties_xml(align)}{"".join(_run_xml(run, color) for run in runs)}</w:p>'
+
+
+def _cell_xml(cell, width, border_color):
+    properties = cell_properties_xml(width, cell.border, border_color, cell.background)
+    color = rgb_hex(cell.color) if cell.color else None
+
+    parts = [f'<w:tc>{properties}', _paragraph_xml(cell.runs, cell.align, color)]
+    for bullet in cell.bullets:
+        parts.append(f'<w:p>{BULLET_PROPERTIES_XML}{BULLET_RUN_XML}{_run_xml(blocks_model.Run(bullet))}</w:p>')
+    parts.append('</w:tc>')
+    return ''.join(parts)
+
+
+def table_xml(block, block_width):
+    """
+    Build the w:tbl XML of a docx_blocks.Table as one string.
+
+    The markup matches what doc.add_table() and per-cell python-docx styling
+    produced, without a python-docx call per cell. Columns are filled right to
+    left, see the bidiVisual flag of TABLE_PROPERTIES_XML.
+
+    Args:
+        block (docx_blocks.Table): Table to render
+        block_width (Length): Width available to the table, split evenly between columns
+    """
+    cols = block.cols
+    default_width = Emu(block_width // cols).twips
+
+    # Column widths are a percent of 6 inches
+    widths = [default_width] * cols
+    for i, width in enumerate(block.col_widths):
+        if width is not None:
+            widths[(cols - 1) - i] = Inches(width / 100 * 6).twips
+
+    empty_cells = [f'<w:tc>{cell_properties_xml(width, False, None, None)}<w:p/></w:tc>' for width in widths]
+
+    parts = [f'<w:tbl {nsdecls("w")}>', TABLE_PROPERTIES_XML, '<w:tblGrid>']
+    parts.extend(f'<w:gridCol w:w="{default_width}"/>' for _ in range(cols))
+    parts.append('</w:tblGrid>')
+
+    for row in block.rows:
+        tcs = list(empty_cells)
+        for j, cell in enumerate(row.cells):
+            column = (cols - 1) - j
+            tcs[column] = _cell_xml(cell, widths[column], block.border_color)
+        parts.append(f'<w:tr>{"".join(tcs)}</w:tr>')
+
+    parts.append('</w:tbl>')
+    return ''.join(parts)
+
+
+def render_blocks(doc, blocks):
+    """
+    Render docx_blocks as docx elements.
+
+    Each table is emitted as XML and parsed once. The elements are not attached
+    to the document, callers insert them where they belong.
+    """
+    added_elements = []
+
+    for block in blocks:
+        if isinstance(block, blocks_model.Table):
+            if block.rows:
+                tbl = parse_xml(table_xml(block, doc._block_width))
+                added_elements.append(Table(tbl, doc._body))
+        elif isinstance(block, blocks_model.Paragraph):
+            p = parse_xml(f'<w:p {nsdecls("w")}>{"".join(_run_xml(run) for run in block.runs)}</w:p>')
+            added_elements.append(Paragraph(p, doc._body))
+
     return added_elements
 
 
-def update_doc_template_with_rtf(doc : Document, replacements) -> bool:
+def convert_html_to_docx_elements(doc, html_content):
+    """Convert HTML content to docx elements using BeautifulSoup"""
+    return render_blocks(doc, html_to_blocks(html_content))
+
+
+def convert_content_to_docx_elements(doc, content):
+    """Convert a replacement, either HTML or a list of docx_blocks, to docx elements"""
+    if isinstance(content, str):
+        return convert_html_to_docx_elements(doc, content)
+    return render_blocks(doc, content)
+
+
+# Matches every {{name}} token in a paragraph's text in one pass
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+HEADER_FOOTER_RELTYPES = (RT.HEADER, RT.FOOTER)
+
+
+def iter_placeholder_parts(doc : Document):
+    """Yield (part, search root) for the body, then every header and footer."""
+    yield doc.part, doc.element.body
+    for rel in doc.part.rels.values():
+        if rel.reltype in HEADER_FOOTER_RELTYPES and not rel.is_external:
+            yield rel.target_part, rel.target_part.element
+
+
+def _scan_placeholders(doc : Document):
+    """Yield (part, paragraph element, placeholder names in text order)."""
+    for part, root in iter_placeholder_parts(doc):
+        for p in root.iter(qn('w:p')):
+            text = p.text
+            if '{{' in text:
+                names = PLACEHOLDER_PATTERN.findall(text)
+                if names:
+                    yield part, p, names
+
+
+def find_placeholders(doc : Document, names=None) -> list:
+    """
+    Scan the document once and return (paragraph element, placeholder name) pairs.
+
+    Paragraphs nested in tables, headers and footers are included. Only the first
+    known placeholder of a paragraph is returned, since the whole paragraph is replaced.
+
+    Args:
+        doc (Document): Document to scan
+        names: Placeholder names to look for, or None for any {{name}} token
+    """
+    hits = []
+    for _, p, tokens in _scan_placeholders(doc):
+        name = next((token for token in tokens if names is None or token in names), None)
+        if name is not None:
+            hits.append((p, name))
+    return hits
+
+
+def index_placeholders(doc : Document) -> list:
+    """
+    Record where the placeholders of a document are, as
+    (part name, element path within the part, placeholder names) entries.
+    Paths stay valid for any deep copy of the document, see resolve_placeholders.
+    """
+    index = []
+    for part, p, tokens in _scan_placeholders(doc):
+        path = part.element.getroottree().getelementpath(p)
+        index.append((str(part.partname), path, tokens))
+    return index
+
+
+def resolve_placeholders(doc : Document, index : list, names=None) -> list:
+    """Turn an index from index_placeholders into find_placeholders hits for a copy of the document."""
+    parts = {str(part.partname): part for part, _ in iter_placeholder_parts(doc)}
+    hits = []
+    for partname, path, tokens in index:
+        name = next((token for token in tokens if names is None or token in names), None)
+        if name is not None:
+            hits.append((parts[partname].element.getroottree().find(path), name))
+    return hits
+
+
+def locate_placeholders(doc : Document, names, placeholder_index=None) -> list:
+    """
+    find_placeholders hits for names, using the precomputed index when there is one.
+
+    The hits are element references, so they stay valid while other placeholders
+    of the document are replaced. Locate once, then replace in as many passes as needed.
+    """
+    if placeholder_index is None:
+        return find_placeholders(doc, names)
+    return resolve_placeholders(doc, placeholder_index, names)
+
+
+def update_doc_template_with_rtf(doc : Document, replacements, placeholder_index=None, hits=None) -> bool:
     """
     Replace placeholders in Word template with formatted HTML content
     
     Args:
-        template_path (str): Path to Word template file
-        replacements (dict): Dictionary of placeholder:html_content pairs
-        output_path (str): Path to save the resulting document
+        doc (Document): Word template to update in place
+        replacements (dict): Dictionary of placeholder:content pairs, content being
+            HTML or a list of docx_blocks
+        placeholder_index (list): Precomputed index_placeholders() of the template, scanned if None
+        hits (list): Placeholders already found with locate_placeholders, only those
+            named in replacements are replaced
     """
     try:
-        
-        # Process paragraphs where replacements are needed
-        for paragraph in doc.paragraphs:
-            for placeholder, html in replacements.items():
-                if f"{{{{{placeholder}}}}}" in paragraph.text:
-                    # Get the paragraph index
-                    p_idx = doc._element.body.index(paragraph._element)
-                    
-                    # Convert HTML to docx elements
-                    elements = convert_html_to_docx_elements(doc, html)
-                    
-                    # Insert elements at the correct position
-                    for idx, element in enumerate(elements):
-                        doc._element.body.insert(p_idx + idx, element._element)
-                    
-                    # Check if any element is a table by checking the XML tag
-                    if any(element._element.tag.endswith('tbl') for element in elements):
-                        empty_p = doc.add_paragraph()
-                        doc._element.body.insert(p_idx + len(elements), empty_p._element)
-                        
-                    # Remove the placeholder paragraph
-                    paragraph._element.getparent().remove(paragraph._element)
-                    break  # Process only one replacement per paragraph
-                
+        # Locate every placeholder first, then splice. The body is never
+        # modified while it is being scanned.
+        if hits is None:
+            hits = locate_placeholders(doc, replacements, placeholder_index)
+        else:
+            hits = [(p, placeholder) for p, placeholder in hits if placeholder in replacements]
+
+        for p, placeholder in hits:
+            # Convert HTML or blocks to docx elements
+            elements = convert_content_to_docx_elements(doc, replacements[placeholder])
+
+            # Insert elements where the placeholder paragraph is
+            for element in elements:
+                p.addprevious(element._element)
+
+            # Check if any element is a table by checking the XML tag
+            if any(element._element.tag.endswith('tbl') for element in elements):
+                p.addprevious(OxmlElement('w:p'))
+
+            parent = p.getparent()
+            parent.remove(p)
+
+            # A table cell must keep at least one paragraph
+            if parent.tag == qn('w:tc') and parent.find(qn('w:p')) is None and parent.find(qn('w:tbl')) is None:
+                parent.append(OxmlElement('w:p'))
+
         return True
         
     except Exception as e:
@@ -294,8 +404,8 @@ if __name__ == "__main__":
         print("Error processing document.")
 
 
-def replace_placeholders_in_docx(document : Document, replacements : str) -> str:
+def replace_placeholders_in_docx(document : Document, replacements : str, placeholder_index=None, hits=None) -> str:
 
-    success = update_doc_template_with_rtf(document, replacements)
+    success = update_doc_template_with_rtf(document, replacements, placeholder_index, hits)
     if not success:
         raise Exception("Error replacing placeholders in document")
@@ -0,0 +1,177 @@
+"""
+Persistent cache of LLM answers.
+
+The remediation analysis prompt depends only on the failure counts of the
+workbook, so a re-submitted workbook can reuse the earlier answer instead of
+paying another model round-trip. Answers are stored in a local SQLite file
+keyed by a hash of the normalized summary, the model and the prompt version.
+Entries expire after `ttl_seconds`, and the least recently used ones are
+evicted beyond `max_entries`.
+
+Cache failures are logged and treated as misses, they never fail a request.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from philips_scorecard.config.registry import ConfigRegistry, get_registry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+DEFAULT_CACHE_PATH = Path(tempfile.gettempdir()) / "philips_llm_cache.sqlite3"
+
+
+def make_cache_key(summary: dict, model: str, prompt_version) -> str:
+    """
+    Content address of an LLM request. The summary is normalized to sorted
+    (text, count) pairs, so the order pandas reports ties in does not matter.
+    """
+    normalized = sorted((str(name).strip(), int(count)) for name, count in summary.items())
+    payload = json.dumps({'summary': normalized, 'model': model, 'prompt_version': prompt_version})
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """SQLite backed cache of LLM answers with TTL and size based eviction"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 1000):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Other worker processes may share the file, wait for their writes
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute(SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached answer for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    connection.commit()
+                    self.expired += 1
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                connection.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                connection.commit()
+                self.hits += 1
+                return row[0]
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.misses += 1
+                logging.warning("LLM cache read failed, calling the model: %s", str(e))
+                return None
+
+    def put(self, key: str, value: str):
+        """Store an answer, then drop expired entries and the least recently used beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self.expired += connection.execute(
+                    "DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,)
+                ).rowcount
+                self.evictions += connection.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                connection.commit()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logging.warning("LLM cache write failed: %s", str(e))
+
+    def stats(self) -> dict:
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+
+    def clear(self):
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("DELETE FROM llm_cache")
+                connection.commit()
+            except sqlite3.Error as e:
+                logging.warning("LLM cache clear failed: %s", str(e))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_loaded = False
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache(registry: Optional[ConfigRegistry] = None) -> Optional[LLMCache]:
+    """
+    Return the process-wide LLM cache, or None when llm_cache.enabled is false.
+    It is created with the settings of registry, by default the process registry.
+    """
+    global _llm_cache, _llm_cache_loaded
+    if not _llm_cache_loaded:
+        with _llm_cache_lock:
+            if not _llm_cache_loaded:
+                cache_config = (registry or get_registry()).llm_cache_config()
+                if cache_config.enabled:
+                    _llm_cache = LLMCache(
+                        path=cache_config.path or DEFAULT_CACHE_PATH,
+                        ttl_seconds=cache_config.ttl_seconds,
+                        max_entries=cache_config.max_entries
+                    )
+                _llm_cache_loaded = True
+    return _llm_cache
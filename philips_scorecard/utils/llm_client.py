@@ -0,0 +1,75 @@
+"""
+Async chat completions for the report generators.
+
+Calls go through the async OpenAI client, so the event loop of the function
+keeps serving other requests during a model round-trip. Every call has a
+deadline, and a semaphore per event loop bounds the calls in flight.
+"""
+import asyncio
+import inspect
+import logging
+import weakref
+
+DEFAULT_MODEL = "gpt-4"
+DEFAULT_TIMEOUT_SECONDS = 30.0
+DEFAULT_MAX_CONCURRENCY = 4
+
+# asyncio.Semaphore binds to the loop it is first used on, so each loop gets its own
+_limiters = weakref.WeakKeyDictionary()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of English text, about 4 characters per token"""
+    return len(text) // 4 + 1
+
+
+def get_limiter(max_concurrency: int) -> asyncio.Semaphore:
+    """The semaphore bounding LLM calls on the running event loop"""
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if max_concurrency not in limiters:
+        limiters[max_concurrency] = asyncio.Semaphore(max_concurrency)
+    return limiters[max_concurrency]
+
+
+def is_async_client(client) -> bool:
+    """True for AsyncAzureOpenAI and other clients with a coroutine create()"""
+    return inspect.iscoroutinefunction(inspect.unwrap(client.chat.completions.create))
+
+
+async def create_chat_completion(client, timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, **request) -> str:
+    """
+    Run one chat completion and return the text of the first choice.
+
+    A synchronous AzureOpenAI client is still accepted, its call runs in a
+    worker thread instead of on the event loop.
+
+    Parameters:
+    client: AsyncAzureOpenAI or AzureOpenAI client
+    timeout (float): Seconds allowed for the call, retries included
+    max_concurrency (int): Calls allowed in flight on this event loop
+    request: Arguments of chat.completions.create, e.g. model and messages
+
+    Raises:
+    TimeoutError: If the model does not answer within timeout
+
+    The prompt token count of every call is logged, as reported by the service
+    or estimated when the response has no usage.
+    """
+    create = client.chat.completions.create
+    async with get_limiter(max_concurrency):
+        if is_async_client(client):
+            call = create(timeout=timeout, **request)
+        else:
+            call = asyncio.to_thread(create, timeout=timeout, **request)
+        try:
+            response = await asyncio.wait_for(call, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM call timed out after {timeout} seconds")
+
+    prompt_tokens = getattr(getattr(response, 'usage', None), 'prompt_tokens', None)
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(''.join(message['content'] for message in request.get('messages', [])))
+    logging.info("LLM call to %s: %d prompt tokens", request.get('model'), prompt_tokens)
+
+    return response.choices[0].message.content
@@ -0,0 +1,80 @@
+"""
+Compaction of failure summaries before they go into an LLM prompt.
+
+Large surveys report hundreds of failure strings that differ only in room
+numbers, AP names or spacing ("Failed RSSI in 2006A", "Failed RSSI in 2010").
+Those are clustered on a normalized form, the clusters are ranked by count,
+the top-k are kept and the rest are folded into one "Other failures" line.
+Lines are dropped from the bottom until the summary fits its token budget.
+"""
+import re
+from collections import Counter
+from philips_scorecard.utils.llm_client import estimate_tokens
+
+# Room numbers and AP names: bare numbers or words mixing letters and digits
+# ("2010", "2006A", "AP-12"). Measurements keep their digits, they are the
+# technical detail the model is asked about: values with a unit ("5GHz",
+# "-67 dBm"), decimals ("2.4GHz", "802.11ac") and channels ("ch 36").
+IDENTIFIER = re.compile(r'''
+    (?<![\w.-])(?<!\bch\ )(?<!\bchannel\ )     # a whole word, not a channel number
+    (?!-?\d+\s*(?:[kmg]hz|dbm|db|mbps|ms|%)(?!\w))  # not a value with a unit
+    (?!ch\d+\b)                                 # not a channel written as one word
+    (?![\w-]*\.\d)                               # not a decimal or version number
+    (?=[\w-]*\d)[a-z0-9][\w-]*(?<![-_])
+''', re.IGNORECASE | re.VERBOSE)
+WHITESPACE = re.compile(r'\s+')
+
+DEFAULT_TOP_K = 20
+DEFAULT_TOKEN_BUDGET = 400
+
+
+def normalize_failure(failure) -> str:
+    """Cluster key of a failure string: lowercase, identifiers replaced by #, single spaces"""
+    text = IDENTIFIER.sub('#', str(failure).lower())
+    return WHITESPACE.sub(' ', text).strip(' .,:;-')
+
+
+def format_summary(summary: dict) -> str:
+    """Prompt lines of a summary, one "- failure: count" per entry"""
+    return '\n'.join(f'- {failure}: {count}' for failure, count in summary.items())
+
+
+def compact_summary(summary: dict, top_k: int = DEFAULT_TOP_K, token_budget: int = DEFAULT_TOKEN_BUDGET) -> dict:
+    """
+    Cluster near-duplicate failures and keep the largest clusters.
+
+    Each cluster is labelled with its most frequent variant. A cluster of several
+    variants shows identifiers as # and the number of variants. The result is ordered by count, and ties
+    by label, so the same failures always compact to the same summary.
+
+    Parameters:
+    summary (dict): Failure text to count, e.g. value_counts().to_dict()
+    top_k (int): Clusters listed individually
+    token_budget (int): Estimated tokens allowed for format_summary() of the result
+
+    Returns:
+    dict: Label to count, the last entry totals the clusters left out
+    """
+    clusters = {}
+    for failure, count in summary.items():
+        label = WHITESPACE.sub(' ', str(failure)).strip()
+        variants = clusters.setdefault(normalize_failure(failure) or label, Counter())
+        variants[label] += int(count)
+
+    entries = []
+    for variants in clusters.values():
+        # Most frequent variant, ties broken alphabetically
+        label = min(variants, key=lambda variant: (-variants[variant], variant))
+        if len(variants) > 1:
+            label = f'{IDENTIFIER.sub("#", label)} ({len(variants)} variants)'
+        entries.append((label, sum(variants.values())))
+    entries.sort(key=lambda entry: (-entry[1], entry[0]))
+
+    kept, rest = entries[:top_k], entries[top_k:]
+    while True:
+        compacted = dict(kept)
+        if rest:
+            compacted[f'Other failures ({len(rest)} types)'] = sum(count for _, count in rest)
+        if not kept or estimate_tokens(format_summary(compacted)) <= token_budget:
+            return compacted
+        rest.insert(0, kept.pop())
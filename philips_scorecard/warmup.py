@@ -0,0 +1,153 @@
+"""
+Warmup of a worker process before it takes traffic.
+
+The first request on a new instance pays for the imports, config parsing,
+the database login, the rules fetch and the template parse. warm_up() does
+all of that eagerly and reports how long each step took. It is called by
+the Functions warmup trigger and the func_warmup route in function_app.
+
+Steps are independent: a failed step is logged and reported, and the ones
+after it still run. Running it again is cheap, everything is cached.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional
+from philips_scorecard.config.registry import ConfigRegistry, get_registry
+
+# Imported by the routes on first use, see function_app
+SCORECARD_MODULES = ('philips_scorecard.build_scorecard',)
+REMEDIATION_MODULES = ('philips_scorecard.remediation_list_generator', 'openai', 'openpyxl', 'bs4')
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    seconds: float
+    ok: bool
+    detail: Optional[str] = None
+
+
+class Warmup:
+    def __init__(self, registry: Optional[ConfigRegistry] = None):
+        self.registry = registry or get_registry()
+        self.steps: List[WarmupStep] = []
+
+    def step(self, name: str, action: Callable[[], Optional[str]]):
+        """Run one step, recording its time and outcome. The action may return a detail string."""
+        start = time.perf_counter()
+        try:
+            detail = action()
+            self.steps.append(WarmupStep(name, time.perf_counter() - start, True, detail))
+        except Exception as e:
+            logging.warning("Warmup step %s failed: %s", name, str(e))
+            self.steps.append(WarmupStep(name, time.perf_counter() - start, False, str(e)))
+
+    def report(self) -> dict:
+        return {
+            'ok': all(step.ok for step in self.steps),
+            'total_seconds': sum(step.seconds for step in self.steps),
+            'steps': [asdict(step) for step in self.steps]
+        }
+
+    def run(self):
+        registry = self.registry
+        self.step('import_scorecard', lambda: import_modules(SCORECARD_MODULES))
+        self.step('import_remediation', lambda: import_modules(REMEDIATION_MODULES))
+        self.step('config', lambda: load_configs(registry))
+
+        try:
+            warmup_config = registry.warmup_config()
+        except Exception as e:
+            logging.warning("Warmup configuration not loaded: %s", str(e))
+            warmup_config = None
+
+        if warmup_config is not None and warmup_config.database:
+            self.step('database_pool', lambda: open_connection(registry))
+            self.step('rules', lambda: load_rules(registry))
+            self.step('form_query', lambda: build_form_query(registry))
+
+        self.step('templates', lambda: parse_templates(warmup_config.template_paths if warmup_config else []))
+        self.step('llm_cache', lambda: load_llm_cache(registry))
+
+
+def import_modules(modules) -> str:
+    for module in modules:
+        importlib.import_module(module)
+    return ', '.join(modules)
+
+
+def load_configs(registry: ConfigRegistry) -> str:
+    registry.database_config()
+    registry.api_config()
+    registry.rules_cache_config()
+    registry.llm_cache_config()
+    registry.warmup_config()
+    return 'database, llm, rules_cache, llm_cache, warmup'
+
+
+def open_connection(registry: ConfigRegistry) -> str:
+    client = registry.database_client()
+    # Acquiring opens a connection (the login handshake), releasing leaves it idle in the pool
+    with client.get_connection() as conn:
+        conn.cursor().execute("SELECT 1")
+    return f"{client.pool_metrics()['idle']} idle connection(s)"
+
+
+def load_rules(registry: ConfigRegistry) -> str:
+    from philips_scorecard.database.rules_cache import get_rules_cache
+    compiled_rules = get_rules_cache(registry).get_compiled_rules(registry.database_client())
+    return f"{len(compiled_rules.rules)} rules"
+
+
+def build_form_query(registry: ConfigRegistry) -> str:
+    from philips_scorecard.database.form_query import form_query_cache
+    from philips_scorecard.database.rules_cache import get_rules_cache
+    client = registry.database_client()
+    form_query = form_query_cache.get(client, get_rules_cache(registry).get_compiled_rules(client))
+    return f"{len(form_query.columns)} columns"
+
+
+def parse_templates(template_paths) -> str:
+    from philips_scorecard.utils.doc_converters import template_cache
+    parsed = []
+    for path in template_paths:
+        if path.exists():
+            template_cache.get(path.read_bytes())
+            parsed.append(path.name)
+        else:
+            logging.info("Warmup template %s not found, skipped", path)
+    return ', '.join(parsed) or 'none'
+
+
+def load_llm_cache(registry: ConfigRegistry) -> str:
+    from philips_scorecard.utils.llm_cache import get_llm_cache
+    llm_cache = get_llm_cache(registry)
+    return 'disabled' if llm_cache is None else f"{llm_cache.stats()['entries']} entries"
+
+
+def warm_up(registry: Optional[ConfigRegistry] = None) -> dict:
+    """Run every warmup step and return the report"""
+    warmup = Warmup(registry)
+    warmup.run()
+    report = warmup.report()
+    logging.info("Warmup finished in %.3fs: %s", report['total_seconds'],
+                 ', '.join(f"{step.name} {step.seconds:.3f}s{'' if step.ok else ' FAILED'}" for step in warmup.steps))
+    return report
+
+
+async def warm_up_async(registry: Optional[ConfigRegistry] = None) -> dict:
+    """
+    warm_up() in a worker thread, plus the async OpenAI client of the running
+    event loop, the one the async remediation route will use.
+    """
+    report = await asyncio.to_thread(warm_up, registry)
+
+    warmup = Warmup(registry)
+    warmup.step('async_openai_client', lambda: type(warmup.registry.async_openai_client()).__name__)
+    report['steps'].extend(asdict(step) for step in warmup.steps)
+    report['ok'] = report['ok'] and all(step.ok for step in warmup.steps)
+    report['total_seconds'] += sum(step.seconds for step in warmup.steps)
+    return report
@@ -0,0 +1,35 @@
+-- Per-rule pass/fail decisions that override the on_yes/on_no columns of dbo.philips_rules.
+-- answer:    'yes', 'no' or 'other' (any other answer, including unanswered)
+-- justified: 'yes', 'no' or NULL for either. 'no' also covers rules without a <rule_id>_justified column
+-- outcome:   'PASS' or 'FAIL'
+-- Changes are picked up by the rules cache without a deploy (see philips_scorecard/database/rules_cache.py).
+
+CREATE TABLE dbo.philips_rule_decisions (
+    rule_id   NVARCHAR(50) NOT NULL,
+    answer    NVARCHAR(10) NOT NULL CHECK (answer IN ('yes', 'no', 'other')),
+    justified NVARCHAR(10) NULL CHECK (justified IN ('yes', 'no')),
+    outcome   NVARCHAR(10) NOT NULL CHECK (outcome IN ('PASS', 'FAIL'))
+);
+
+-- Seed with the decisions previously hardcoded in ScorecardGenerator.process_form_data
+INSERT INTO dbo.philips_rule_decisions (rule_id, answer, justified, outcome) VALUES
+    ('bp_4_3', 'yes', 'yes', 'PASS'),
+    ('bp_4_3', 'yes', 'no', 'FAIL'),
+    ('bp_4_3', 'no', NULL, 'PASS'),
+    ('bp_4_4', 'yes', NULL, 'FAIL'),
+    ('bp_4_4', 'no', NULL, 'PASS'),
+    ('bp_4_5', 'yes', NULL, 'PASS'),
+    ('bp_4_5', 'no', 'yes', 'PASS'),
+    ('bp_4_5', 'no', 'no', 'FAIL'),
+    ('bp_4_5', 'other', 'yes', 'PASS'),
+    ('bp_4_5', 'other', 'no', 'FAIL'),
+    ('bp_8_3', 'yes', NULL, 'PASS'),
+    ('bp_8_3', 'no', 'yes', 'PASS'),
+    ('bp_8_3', 'no', 'no', 'FAIL'),
+    ('bp_8_3', 'other', 'yes', 'PASS'),
+    ('bp_8_3', 'other', 'no', 'FAIL'),
+    ('bp_9_1', 'yes', NULL, 'PASS'),
+    ('bp_9_1', 'no', 'yes', 'PASS'),
+    ('bp_9_1', 'no', 'no', 'FAIL'),
+    ('bp_9_1', 'other', 'yes', 'PASS'),
+    ('bp_9_1', 'other', 'no', 'FAIL');
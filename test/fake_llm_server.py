@@ -0,0 +1,62 @@
+"""Fake chat completions server shared by the LLM tests"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    '''
+    Local stand-in for the Azure OpenAI chat completions endpoint.
+    Answers every POST after `delay` seconds and records the requests.
+    '''
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), FakeLLMHandler)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests.append((self.path, body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        response = json.dumps({
+            'id': 'fake', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': 'Low RSSI dominates.'}}],
+        }).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. after a timeout
+            pass
+
+    def log_message(self, *args):
+        pass
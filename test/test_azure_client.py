@@ -0,0 +1,180 @@
+import sys
+import os
+import threading
+import time
+import pymssql
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.database import azure_client
+from philips_scorecard.database.azure_client import AzureClientMSSQL, ConnectionPool, retire_pool
+
+
+class FakeConnection:
+    def __init__(self, number, pool=None):
+        self.number = number
+        self.healthy = True
+        self.closed = False
+        self.pool = pool
+        self.lock_free_on_close = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        if self.pool is not None:
+            # Another thread must be able to use the pool while we close
+            result = []
+
+            def try_lock():
+                acquired = self.pool._cond.acquire(timeout=1)
+                if acquired:
+                    self.pool._cond.release()
+                result.append(acquired)
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            self.lock_free_on_close = result[0]
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if not self.conn.healthy:
+            raise pymssql.OperationalError("connection is closed")
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnect:
+    def __init__(self):
+        self.connections = []
+        self.pool = None
+
+    def __call__(self):
+        conn = FakeConnection(len(self.connections), self.pool)
+        self.connections.append(conn)
+        return conn
+
+
+def make_pool(**kwargs):
+    connect = FakeConnect()
+    pool = ConnectionPool(connect=connect, **kwargs)
+    connect.pool = pool
+    return pool, connect
+
+
+def test_idle_connections_are_reused():
+    pool, connect = make_pool()
+
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+    metrics = pool.metrics()
+    assert (metrics['opens'], metrics['hits'], metrics['in_use']) == (1, 1, 1)
+
+
+def test_acquire_waits_for_a_free_slot_then_times_out():
+    pool, connect = make_pool(max_size=1, acquire_timeout=0.5)
+    conn = pool.acquire()
+
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+    assert pool.acquire() is conn
+    assert pool.metrics()['waits'] == 1
+
+    pool.acquire_timeout = 0.05
+    with pytest.raises(Exception, match="Timed out"):
+        pool.acquire()
+    assert pool.metrics()['timeouts'] == 1
+    assert len(connect.connections) == 1
+
+
+def test_expired_and_unhealthy_connections_are_closed_outside_the_lock():
+    pool, connect = make_pool(max_size=1, max_idle_seconds=0.01)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.02)
+
+    # Expired while idle: closed and replaced, even though the pool is full
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed and conn.lock_free_on_close
+
+    # Idle past the health check and failing the ping: closed and replaced
+    pool.max_idle_seconds = 300
+    pool.health_check_after_seconds = 0
+    pool.release(replacement)
+    replacement.healthy = False
+    third = pool.acquire()
+    assert third is not replacement
+    assert replacement.closed and replacement.lock_free_on_close
+
+    # Released as broken
+    pool.release(third, broken=True)
+    assert third.closed and third.lock_free_on_close
+    assert pool.metrics()['discards'] == 3
+    assert pool.metrics()['in_use'] == 0
+
+
+def make_client(server='test.database.windows.net'):
+    client = AzureClientMSSQL(server, 'wits', 'scorecard', 'secret', pool_size=2)
+    connect = FakeConnect()
+    client.pool._connect = connect
+    return client, connect
+
+
+def test_read_is_retried_once_on_a_broken_connection():
+    client, connect = make_client('retry.database.windows.net')
+    reads = []
+
+    def read(conn):
+        reads.append(conn)
+        if len(reads) == 1:
+            conn.healthy = False
+            raise pymssql.OperationalError("connection reset")
+        return 'rows'
+
+    assert client._run_read(read) == 'rows'
+    assert [conn.number for conn in reads] == [0, 1]
+    assert reads[0].closed
+
+    def always_fails(conn):
+        conn.healthy = False
+        raise pymssql.OperationalError("server gone")
+
+    with pytest.raises(pymssql.OperationalError):
+        client._run_read(always_fails)
+    assert client.pool.metrics()['in_use'] == 0
+
+
+def test_retire_pool_closes_idle_connections():
+    client, connect = make_client('retire.database.windows.net')
+    client.pool.release(client.pool.acquire())
+
+    retire_pool(client.server, client.database, client.username)
+
+    assert connect.connections[0].closed
+    assert AzureClientMSSQL(client.server, 'wits', 'scorecard', 'secret').pool is not client.pool
+    assert (client.server, 'wits', 'scorecard') in azure_client._pools
+
+
+def test_connections_released_after_retire_are_closed():
+    client, connect = make_client('retired.database.windows.net')
+    conn = client.pool.acquire()
+    assert client.pool.executor is not None
+
+    retire_pool(client.server, client.database, client.username)
+    client.pool.release(conn)
+
+    assert conn.closed
+    metrics = client.pool.metrics()
+    assert (metrics['idle'], metrics['in_use']) == (0, 0)
+    # Late queries of clients holding the retired pool use the default executor
+    assert client.pool.executor is None
@@ -0,0 +1,186 @@
+import sys
+import os
+import re
+import json
+import asyncio
+import base64
+import pytest
+import azure.functions as func
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import function_app
+import philips_scorecard.build_scorecard as build_scorecard
+from philips_scorecard.config.config_loader import DatabaseConfig, ScorecardConfig
+from philips_scorecard.database.form_query import FormQueryCache
+from philips_scorecard.database.rules_cache import RulesCache, normalize_rules
+from philips_scorecard.utils.doc_converters import word_to_base64
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'philips_scorecard', 'io', 'philips_scorecard_template.docx')
+
+RULES = [
+    {'rule_no': 1, 'rule_id': 'BP_1_1', 'bp_section': 'bp1', 'question': 'Door closes?',
+     'question_category': 'Doors', 'finding': 'Door open', 'recommendation': 'Close it',
+     'on_yes': 'PASS', 'on_no': 'FAIL'},
+    {'rule_no': 2, 'rule_id': 'BP_2_1', 'bp_section': 'bp2', 'question': 'Badge reader?',
+     'question_category': 'Access', 'finding': 'No reader', 'recommendation': 'Install one',
+     'on_yes': 'PASS', 'on_no': 'FAIL'},
+]
+FORMS = {
+    1: {'id': 1, 'site_name': 'North', 'bp_1_1': 'Yes', 'bp_2_1': 'No', 'bp_3_1': 'No'},
+    2: {'id': 2, 'site_name': 'South', 'bp_1_1': 'No', 'bp_2_1': 'Yes', 'bp_3_1': 'Yes'},
+}
+NEW_RULE = {'rule_no': 3, 'rule_id': 'BP_3_1', 'bp_section': 'bp3', 'question': 'Spare AP?',
+            'question_category': 'Coverage', 'finding': 'No spare', 'recommendation': 'Stock one',
+            'on_yes': 'PASS', 'on_no': 'FAIL'}
+
+
+class ScorecardClient:
+    """Serves the rules, the form table's columns and the submissions in FORMS"""
+
+    def __init__(self):
+        self.rules = list(RULES)
+        self.checksum = 'a1'
+        self.fail_forms = False
+        self.queries = []
+
+    def fetch_records(self, query, params=None):
+        self.queries.append((query, params))
+        if 'OBJECT_ID' in query:
+            return [{'object_id': None}]
+        if 'HASHBYTES' in query:
+            return [{'row_count': len(self.rules), 'checksum': self.checksum}]
+        if 'INFORMATION_SCHEMA' in query:
+            return [{'COLUMN_NAME': column} for column in ('id', 'site_name', 'bp_1_1', 'bp_2_1', 'bp_3_1')]
+        if 'sp_executesql' in query:
+            if self.fail_forms:
+                raise Exception("connection reset")
+            columns = re.findall(r'\[([^\]]+)\]', query.split(' FROM ')[0])
+            ids = [int(form_row_id) for form_row_id in str(params[0]).split(',')]
+            return [{column: FORMS[i][column] for column in columns} for i in ids if i in FORMS]
+        return self.rules
+
+    async def run_blocking(self, function, *args):
+        return await asyncio.to_thread(function, *args)
+
+    def form_queries(self):
+        return [params for query, params in self.queries if 'sp_executesql' in query]
+
+
+class FakeRegistry:
+    def __init__(self, client, max_batch_size=50):
+        self.client = client
+        self.max_batch_size = max_batch_size
+
+    def database_config(self):
+        return DatabaseConfig(server='test', database='wits', username='scorecard', password='secret')
+
+    def scorecard_config(self):
+        return ScorecardConfig(max_batch_size=self.max_batch_size)
+
+    def database_client(self):
+        return self.client
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = FakeRegistry(ScorecardClient())
+    rules_cache = RulesCache(check_interval_seconds=0)
+    monkeypatch.setattr(build_scorecard, 'get_registry', lambda: registry)
+    monkeypatch.setattr(build_scorecard, 'get_rules_cache', lambda: rules_cache)
+    monkeypatch.setattr(build_scorecard, 'form_query_cache', FormQueryCache())
+    return registry
+
+
+def template_bytes():
+    with open(TEMPLATE_PATH, 'rb') as f:
+        return f.read()
+
+
+def test_batch_reports_missing_ids_per_entry(registry):
+    documents = build_scorecard.ScorecardGenerator().build_scorecards(template_bytes(), [2, 404, 1])
+
+    assert [document.form_row_id for document in documents] == [2, 404, 1]
+    assert documents[0].content.startswith(b'PK') and documents[0].error is None
+    assert documents[1].content is None
+    assert documents[1].error == "Form submission 404 not found"
+    assert documents[2].content.startswith(b'PK') and documents[2].error is None
+    # One query for the submissions of the whole batch
+    assert registry.client.form_queries() == [('1,2,404',)]
+
+
+def test_batch_reports_a_failed_query_in_every_entry(registry):
+    registry.client.fail_forms = True
+
+    documents = build_scorecard.ScorecardGenerator().build_scorecards(template_bytes(), [1, 2])
+
+    assert [document.form_row_id for document in documents] == [1, 2]
+    assert all(document.content is None for document in documents)
+    assert all(document.error == "Failed to load form data: connection reset" for document in documents)
+
+
+def test_batch_route_rejects_batches_above_the_limit(registry):
+    registry.max_batch_size = 2
+    body = json.dumps({'form_row_ids': [1, 2, 404], 'document_content': word_to_base64(TEMPLATE_PATH)})
+    req = func.HttpRequest(method='POST', url='/api/test', body=body.encode(),
+                           headers={'Content-Type': 'application/json'})
+
+    response = function_app.func_build_philips_scorecard_batch._function.get_user_function()(req)
+
+    assert response.status_code == 400
+    assert b'At most 2' in response.get_body()
+    assert not registry.client.queries
+
+
+def test_combined_findings_are_grouped_by_section_in_rule_order(registry):
+    rules = normalize_rules([
+        {'rule_no': 1, 'rule_id': 'bp_2_1', 'bp_section': 'bp2', 'finding': 'First', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+        {'rule_no': 2, 'rule_id': 'bp_1_1', 'bp_section': 'bp1', 'finding': 'Second', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+        {'rule_no': 3, 'rule_id': 'bp_2_2', 'bp_section': 'bp2', 'finding': 'Third', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+        {'rule_no': 4, 'rule_id': 'bp_3_1', 'bp_section': 'bp3', 'finding': 'Fourth', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+    ])
+    generator = build_scorecard.ScorecardGenerator()
+    results = generator.process_form_data({rule.rule_id: 'No' for rule in rules}, rules)
+
+    findings_table = generator.get_bp_sections(results)['bp_combined_findings'][0]
+
+    findings = [row.cells[0].runs[0].text for row in findings_table.rows[1:]]
+    assert findings == ['First', 'Third', 'Second', 'Fourth']
+
+
+def test_async_route_refetches_the_submission_when_the_rules_change(registry):
+    client = registry.client
+    generator = build_scorecard.ScorecardGenerator()
+
+    async def build_twice():
+        # No rules cached yet: the rules are loaded, then the submission
+        await generator.build_scorecard_bytes_async(template_bytes(), 1)
+        client.rules = RULES + [NEW_RULE]
+        client.checksum = 'b2'
+        # The submission is fetched with the cached rules' columns while the
+        # changed version is found, then fetched again with the new rules
+        rules, submission = await generator.load_scorecard_data_async(1)
+        return rules, submission
+
+    rules, submission = asyncio.run(build_twice())
+
+    assert [rule.rule_id for rule in rules.rules] == ['bp_1_1', 'bp_2_1', 'bp_3_1']
+    assert submission['bp_3_1'] == 'No'
+    assert client.form_queries() == [(1,), (1,), (1,)]
+    form_columns = [query for query, _ in client.queries if 'sp_executesql' in query]
+    assert '[bp_3_1]' not in form_columns[1] and '[bp_3_1]' in form_columns[2]
+
+
+def test_async_route_returns_the_scorecard(registry):
+    body = json.dumps({'form_row_id': 2, 'document_content': word_to_base64(TEMPLATE_PATH)})
+    req = func.HttpRequest(method='POST', url='/api/test', body=body.encode(),
+                           headers={'Content-Type': 'application/json'})
+
+    response = asyncio.run(function_app.func_build_philips_scorecard._function.get_user_function()(req))
+
+    assert response.status_code == 200
+    # JSON requests get the double-encoded body the Power Automate flows parse
+    content = base64.b64decode(json.loads(json.loads(response.get_body()))['new_document_content'])
+    assert content.startswith(b'PK')
+    assert registry.client.form_queries() == [(2,)]
@@ -0,0 +1,102 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from philips_scorecard.config.registry import ConfigRegistry
+from philips_scorecard.database import azure_client
+from philips_scorecard.utils.llm_client import create_chat_completion
+from fake_llm_server import FakeLLMServer
+
+
+CONFIG = '''
+db:
+  server: {server}
+  database: wits
+llm:
+  endpoint: {endpoint}
+  model: {model}
+  api_version: 2024-02-15-preview
+'''
+
+
+def write_config(path, server='one.database.windows.net', model='gpt-4',
+                 endpoint='https://example.openai.azure.com'):
+    path.write_text(CONFIG.format(server=server, model=model, endpoint=endpoint))
+    # Make the change visible even on file systems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_registry_reuses_clients_until_config_changes(tmp_path, monkeypatch):
+    # Pools are process-wide, keep the ones created here out of other tests
+    monkeypatch.setattr(azure_client, '_pools', {})
+    monkeypatch.setenv('DB_USERNAME', 'scorecard')
+    monkeypatch.setenv('DB_PASSWORD', 'secret')
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'key')
+    config_path = tmp_path / 'config.yml'
+    write_config(config_path)
+    registry = ConfigRegistry(check_interval_seconds=0, config_path=config_path, env_path=tmp_path / '.env')
+
+    client = registry.database_client()
+    openai_client = registry.openai_client()
+    assert registry.database_client() is client
+    assert registry.openai_client() is openai_client
+    assert registry.api_config().model == 'gpt-4'
+
+    write_config(config_path, server='two.database.windows.net', model='gpt-4o')
+
+    assert registry.database_client() is not client
+    assert registry.database_client().server == 'two.database.windows.net'
+    assert registry.openai_client() is not openai_client
+    assert registry.api_config().model == 'gpt-4o'
+    assert registry.stats()['reloads'] == 1
+
+
+def test_reload_keeps_the_pool_when_database_settings_are_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setattr(azure_client, '_pools', {})
+    monkeypatch.setenv('DB_USERNAME', 'scorecard')
+    monkeypatch.setenv('DB_PASSWORD', 'secret')
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'key')
+    config_path = tmp_path / 'config.yml'
+    write_config(config_path)
+    registry = ConfigRegistry(check_interval_seconds=0, config_path=config_path, env_path=tmp_path / '.env')
+    pool = registry.database_client().pool
+
+    write_config(config_path, model='gpt-4o')
+    assert registry.api_config().model == 'gpt-4o'
+    assert registry.database_client().pool is pool
+
+    registry.reload()
+    assert registry.database_client().pool is pool
+    assert not pool._retired
+
+    write_config(config_path, server='two.database.windows.net')
+    assert registry.database_client().pool is not pool
+    assert pool._retired
+
+
+def test_call_in_flight_during_a_reload_succeeds(tmp_path, monkeypatch):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'key')
+    config_path = tmp_path / 'config.yml'
+
+    async def call_across_reload(server):
+        old_client = registry.async_openai_client()
+        call = asyncio.create_task(create_chat_completion(
+            old_client, timeout=5, model='gpt-4', messages=[{'role': 'user', 'content': 'Summarize'}]
+        ))
+        await asyncio.sleep(0.2)
+        write_config(config_path, model='gpt-4o', endpoint=server.endpoint)
+        new_client = registry.async_openai_client()
+        return old_client, new_client, await call
+
+    with FakeLLMServer(delay=1.0) as server:
+        write_config(config_path, endpoint=server.endpoint)
+        registry = ConfigRegistry(check_interval_seconds=0, config_path=config_path, env_path=tmp_path / '.env')
+        old_client, new_client, answer = asyncio.run(call_across_reload(server))
+
+    assert answer == 'Low RSSI dominates.'
+    assert new_client is not old_client
+    assert registry.stats()['reloads'] == 1
@@ -0,0 +1,108 @@
+import sys
+import os
+from io import BytesIO
+import openpyxl
+from docx import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.utils.doc_converters import read_excel_columns, TemplateCache, convert_doc_to_bytes
+
+
+def make_workbook():
+    workbook = openpyxl.Workbook()
+    floor = workbook.active
+    floor.title = '1st Floor'
+    floor.append(['Floor', 'Failure', 'Finding Details', 'Action', 'Remediation Detail'])
+    floor.append(['1', 'Failed RSSI', 'F1.1 - Failed RSSI in 1001', 'x', 'Add AP'])
+    floor.append(['1', 'Failed SNR', 'short', 'x', 'Ignored'])
+    floor.append(['1', None, 'F1.2 - Missing failure', 'x', '#REF!'])
+    summary = workbook.create_sheet('Summary')
+    summary.append(['Total', 3])
+    summary.append(['This row is never read', 1])
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def test_read_excel_columns_projects_and_filters():
+    sheets = read_excel_columns(make_workbook(), ['Failure', 'Finding Details', 'Remediation Detail'],
+                                'Finding Details', min_length=10)
+
+    assert list(sheets) == ['1st Floor']
+    df = sheets['1st Floor']
+    assert list(df.columns) == ['Failure', 'Finding Details', 'Remediation Detail']
+    assert df['Finding Details'].tolist() == ['F1.1 - Failed RSSI in 1001', 'F1.2 - Missing failure']
+    assert df['Failure'].isna().tolist() == [False, True]
+    assert df['Remediation Detail'].isna().tolist() == [False, True]
+
+
+def make_template(text):
+    doc = Document()
+    doc.add_paragraph(text)
+    doc.add_paragraph('{{bp1}}')
+    return convert_doc_to_bytes(doc)
+
+
+def paragraphs(template):
+    return [p.text for p in template.document.paragraphs]
+
+
+def test_template_cache_evicts_least_recently_used_beyond_max_entries():
+    cache = TemplateCache(max_entries=2)
+    first, second, third = make_template('first'), make_template('second'), make_template('third')
+
+    cache.get(first)
+    cache.get(second)
+    cache.get(first)
+    cache.get(third)
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 1
+    # second was the least recently used
+    cache.get(first)
+    cache.get(second)
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 4)
+
+
+def test_template_cache_evicts_beyond_max_bytes():
+    first, second = make_template('first'), make_template('second')
+    size = TemplateCache._uncompressed_size(first)
+    cache = TemplateCache(max_bytes=size + size // 2)
+
+    cache.get(first)
+    cache.get(second)
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions']) == (1, 1)
+    assert stats['bytes'] == TemplateCache._uncompressed_size(second)
+
+
+def test_template_cache_never_caches_oversized_templates():
+    template = make_template('large')
+    cache = TemplateCache(max_bytes=TemplateCache._uncompressed_size(template) - 1)
+
+    assert paragraphs(cache.get(template)) == ['large', '{{bp1}}']
+    cache.get(template)
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['hits'], stats['misses']) == (0, 0, 0, 2)
+
+
+def test_template_cache_hands_out_independent_copies():
+    cache = TemplateCache()
+    template = make_template('shared')
+
+    first = cache.get(template)
+    first.document.paragraphs[1].text = 'filled in'
+    first.document.add_paragraph('added')
+    second = cache.get(template)
+
+    assert second.document is not first.document
+    assert paragraphs(second) == ['shared', '{{bp1}}']
+    assert cache.stats()['hits'] == 1
+
+
+if __name__ == "__main__":
+    test_read_excel_columns_projects_and_filters()
+    print("ok")
@@ -0,0 +1,62 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.database.form_query import FormQueryCache, FormQuery, projected_columns
+from philips_scorecard.database.rules_cache import RulesCache, normalize_rules
+
+
+RULES = [
+    {'rule_no': 2, 'rule_id': 'BP_1_2', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+    {'rule_no': 1, 'rule_id': 'bp_1_1', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+    {'rule_no': 3, 'rule_id': 'bp_9_9', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+]
+TABLE_COLUMNS = ['id', 'site_name', 'notes', 'bp_1_1', 'bp_1_2', 'bp_1_2_justified']
+
+
+class SchemaClient:
+    """Answers the INFORMATION_SCHEMA query of FormQueryCache"""
+
+    def __init__(self):
+        self.queries = []
+
+    def fetch_records(self, query, params=None):
+        self.queries.append((query, params))
+        return [{'COLUMN_NAME': column} for column in TABLE_COLUMNS]
+
+
+def compiled(rules):
+    return RulesCache._compile(normalize_rules(rules), None, None)
+
+
+def test_projection_keeps_rule_columns_in_rule_order():
+    columns = projected_columns(normalize_rules(RULES), TABLE_COLUMNS)
+
+    # Free-text columns and rules missing from the table are left out
+    assert columns == ['id', 'bp_1_1', 'bp_1_2', 'bp_1_2_justified']
+
+
+def test_query_text_is_the_same_for_every_id():
+    form_query = FormQuery(['id', "it's", 'a]b', '100%'], None)
+
+    assert form_query.single_sql == (
+        "EXEC sp_executesql N'SELECT [id], [it''s], [a]]b], [100%%] FROM [dbo].[philips_form_submission] "
+        "WHERE [id] = @id', N'@id int', @id = %d"
+    )
+    assert "STRING_SPLIT(@ids, '','')" in form_query.batch_sql
+    assert form_query.batch_sql.endswith("@ids = %s")
+
+
+def test_query_is_rebuilt_only_when_the_rules_change():
+    client = SchemaClient()
+    cache = FormQueryCache()
+    rules = compiled(RULES)
+
+    first = cache.get(client, rules)
+    assert cache.get(client, rules) is first
+    assert len(client.queries) == 1
+
+    changed = cache.get(client, compiled(RULES[:1]))
+    assert changed.columns == ['id', 'bp_1_2', 'bp_1_2_justified']
+    assert cache.stats() == {'hits': 1, 'builds': 2, 'columns': 3}
@@ -0,0 +1,51 @@
+import sys
+import os
+import asyncio
+import azure.functions as func
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import function_app
+from philips_scorecard.utils.http_transport import DOCX_MIMETYPE, OCTET_STREAM_MIMETYPE
+
+
+def make_request(body=b'', headers=None, params=None):
+    return func.HttpRequest(method='POST', url='/api/test', body=body,
+                            headers=headers or {}, params=params or {})
+
+
+def call_route(route, req):
+    response = route._function.get_user_function()(req)
+    if asyncio.iscoroutine(response):
+        response = asyncio.run(response)
+    return response
+
+
+def multipart_body(boundary, files):
+    body = b''
+    for name, content in files.items():
+        body += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}"\r\n'
+            f'Content-Type: {OCTET_STREAM_MIMETYPE}\r\n\r\n'
+        ).encode() + content + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode()
+
+
+def test_remediation_route_rejects_raw_body():
+    req = make_request(b'PK\x03\x04', {'Content-Type': OCTET_STREAM_MIMETYPE})
+
+    response = call_route(function_app.func_remediation_list_generator, req)
+
+    assert response.status_code == 400
+    assert b'multipart/form-data' in response.get_body()
+
+
+def test_remediation_route_rejects_missing_part():
+    boundary = 'b0undary'
+    req = make_request(multipart_body(boundary, {'excel_content': b'PK\x03\x04xlsx'}),
+                       {'Content-Type': f'multipart/form-data; boundary={boundary}', 'Accept': DOCX_MIMETYPE})
+
+    response = call_route(function_app.func_remediation_list_generator, req)
+
+    assert response.status_code == 400
+    assert b'output_template_content' in response.get_body()
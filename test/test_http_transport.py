@@ -0,0 +1,64 @@
+import sys
+import os
+import gzip
+import azure.functions as func
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.utils.http_transport import (
+    DOCX_MIMETYPE, JSON_MIMETYPE, is_binary_request, wants_binary_response,
+    get_upload, get_parameter, http_response, docx_response
+)
+
+
+def make_request(body=b'', headers=None, params=None):
+    return func.HttpRequest(method='POST', url='/api/test', body=body,
+                            headers=headers or {}, params=params or {})
+
+
+def test_multipart_upload():
+    boundary = 'b0undary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="form_row_id"\r\n\r\n42\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="document_content"; filename="t.docx"\r\n'
+        f'Content-Type: {DOCX_MIMETYPE}\r\n\r\n'
+    ).encode() + b'PK\x03\x04docx' + f'\r\n--{boundary}--\r\n'.encode()
+    req = make_request(body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    assert is_binary_request(req)
+    assert wants_binary_response(req)
+    assert get_upload(req, 'document_content') == b'PK\x03\x04docx'
+    assert get_upload(req, 'excel_content') is None
+    assert get_parameter(req, 'form_row_id') == '42'
+
+
+def test_raw_upload_with_query_parameters():
+    req = make_request(b'PK\x03\x04', {'Content-Type': 'application/octet-stream', 'Accept': JSON_MIMETYPE},
+                       params={'form_row_id': '7'})
+
+    assert get_upload(req, 'document_content') == b'PK\x03\x04'
+    assert get_parameter(req, 'form_row_id') == '7'
+    # The client asked for JSON back
+    assert not wants_binary_response(req)
+
+
+def test_json_request_stays_json_unless_accept_asks_for_docx():
+    assert not is_binary_request(make_request(b'{}', {'Content-Type': JSON_MIMETYPE}))
+    assert not wants_binary_response(make_request(b'{}', {'Content-Type': JSON_MIMETYPE, 'Accept': '*/*'}))
+    assert wants_binary_response(make_request(b'{}', {'Content-Type': JSON_MIMETYPE, 'Accept': DOCX_MIMETYPE}))
+
+
+def test_gzip_negotiation():
+    body = '{"new_document_content": "' + 'A' * 4096 + '"}'
+
+    response = http_response(make_request(headers={'Accept-Encoding': 'gzip, deflate'}), body, JSON_MIMETYPE)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_body()).decode() == body
+
+    response = http_response(make_request(headers={'Accept-Encoding': 'gzip;q=0'}), body, JSON_MIMETYPE)
+    assert 'Content-Encoding' not in response.headers
+
+    # .docx is a zip archive already
+    response = docx_response(make_request(headers={'Accept-Encoding': 'gzip'}), b'PK' * 4096, 'out.docx')
+    assert 'Content-Encoding' not in response.headers
+    assert response.mimetype == DOCX_MIMETYPE
@@ -0,0 +1,19 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.utils.import_profile import IMPORT_BUDGETS, measure_imports, check_budget
+
+
+@pytest.mark.parametrize('module', list(IMPORT_BUDGETS))
+def test_import_within_budget(module):
+    report = measure_imports(module)
+    assert check_budget(report, *IMPORT_BUDGETS[module]) == []
+
+
+if __name__ == "__main__":
+    for module in IMPORT_BUDGETS:
+        test_import_within_budget(module)
+    print("ok")
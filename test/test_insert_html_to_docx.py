@@ -0,0 +1,66 @@
+import sys
+import os
+import pytest
+from io import BytesIO
+from docx import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.utils.doc_converters import TemplateCache, convert_doc_to_bytes
+from philips_scorecard.utils.insert_html_to_docx import (
+    iter_placeholder_parts, locate_placeholders, replace_placeholders_in_docx
+)
+
+REPLACEMENTS = {
+    'body_text': '<p>Filled body</p>',
+    'header_text': '<p>Filled header</p>',
+    'footer_text': '<p>Filled footer</p>',
+    'cell_text': '<p>Filled cell</p>',
+}
+
+
+def make_template() -> bytes:
+    """A .docx with one placeholder each in the body, the header, the footer and a table cell"""
+    doc = Document()
+    doc.add_paragraph('{{body_text}}')
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = 'Label'
+    table.cell(0, 1).text = '{{cell_text}}'
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = '{{header_text}}'
+    section.footer.paragraphs[0].text = '{{footer_text}}'
+    return convert_doc_to_bytes(doc)
+
+
+def part_text(root):
+    return ''.join(t.text or '' for t in root.iter() if t.tag.endswith('}t'))
+
+
+def test_placeholders_are_found_in_body_header_footer_and_tables():
+    doc = Document(BytesIO(make_template()))
+
+    parts = list(iter_placeholder_parts(doc))
+    hits = locate_placeholders(doc, REPLACEMENTS)
+
+    assert len(parts) == 3
+    assert sorted(name for _, name in hits) == sorted(REPLACEMENTS)
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_every_placeholder_is_replaced(indexed):
+    if indexed:
+        # A copy of the cached template, located through the index of the original
+        template = TemplateCache().get(make_template())
+        doc, placeholder_index = template.document, template.placeholder_index
+    else:
+        doc, placeholder_index = Document(BytesIO(make_template())), None
+
+    replace_placeholders_in_docx(doc, REPLACEMENTS, placeholder_index)
+
+    section = doc.sections[0]
+    body, header, footer = part_text(doc.element.body), part_text(section.header._element), part_text(section.footer._element)
+    assert '{{' not in body + header + footer
+    assert 'Filled body' in body
+    assert doc.tables[0].cell(0, 1).text == 'Filled cell'
+    assert header == 'Filled header'
+    assert footer == 'Filled footer'
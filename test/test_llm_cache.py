@@ -0,0 +1,72 @@
+import asyncio
+import sys
+import os
+import time
+from types import SimpleNamespace
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.remediation_list_generator import FindingsDocumentGenerator
+from philips_scorecard.utils.llm_cache import LLMCache, make_cache_key
+
+
+class CountingClient:
+    '''Async stand-in for AsyncAzureOpenAI that numbers its answers'''
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.calls += 1
+        message = SimpleNamespace(content=f'analysis {self.calls}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_cache_key_ignores_summary_order():
+    assert (make_cache_key({'Failed RSSI': 2, 'Failed SNR': 1}, 'gpt-4', 1)
+            == make_cache_key({'Failed SNR': 1, 'Failed RSSI ': 2}, 'gpt-4', 1))
+    assert make_cache_key({'Failed RSSI': 2}, 'gpt-4', 1) != make_cache_key({'Failed RSSI': 2}, 'gpt-4', 2)
+    assert make_cache_key({'Failed RSSI': 2}, 'gpt-4', 1) != make_cache_key({'Failed RSSI': 3}, 'gpt-4', 1)
+
+
+def test_generator_reuses_cached_analysis(tmp_path):
+    cache = LLMCache(tmp_path / 'llm.sqlite3')
+    client = CountingClient()
+    generator = FindingsDocumentGenerator(client, llm_cache=cache)
+    findings = pd.DataFrame({'Failure': ['Failed RSSI', 'Failed SNR', 'Failed RSSI']})
+
+    assert asyncio.run(generator.generate_finding_description(findings)) == 'analysis 1'
+    assert asyncio.run(generator.generate_finding_description(findings)) == 'analysis 1'
+    # Bypass asks the model again and stores the new answer
+    assert asyncio.run(generator.generate_finding_description(findings, bypass_cache=True)) == 'analysis 2'
+    assert asyncio.run(generator.generate_finding_description(findings)) == 'analysis 2'
+
+    assert client.calls == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+
+
+def test_cache_expires_and_evicts(tmp_path):
+    cache = LLMCache(tmp_path / 'llm.sqlite3', ttl_seconds=60, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key)
+    assert cache.get('a') is None
+    assert cache.get('c') == 'c'
+    assert cache.stats()['evictions'] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get('c') is None
+    assert cache.stats()['expired'] == 1
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_cache_key_ignores_summary_order()
+    with tempfile.TemporaryDirectory() as directory:
+        test_generator_reuses_cached_analysis(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_cache_expires_and_evicts(Path(directory))
+    print("ok")
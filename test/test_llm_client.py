@@ -0,0 +1,85 @@
+import asyncio
+import sys
+import os
+import pandas as pd
+import pytest
+from openai import AsyncAzureOpenAI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from philips_scorecard.config.config_loader import APIConfig, PerFloorAnalysisConfig
+from philips_scorecard.remediation_list_generator import FindingsDocumentGenerator
+from fake_llm_server import FakeLLMServer
+
+
+def make_generator(server, timeout=5.0, max_concurrency=2):
+    api_config = APIConfig(api_key='test', api_version='2024-02-15-preview', azure_endpoint=server.endpoint,
+                           model='test-deployment', timeout_seconds=timeout,
+                           max_concurrent_requests=max_concurrency, max_retries=0)
+    client = AsyncAzureOpenAI(api_key=api_config.api_key, api_version=api_config.api_version,
+                              azure_endpoint=api_config.azure_endpoint, max_retries=0)
+    return client, FindingsDocumentGenerator(client, api_config)
+
+
+FINDINGS = pd.DataFrame({'Failure': ['Failed RSSI', 'Failed RSSI', 'Failed SNR']})
+
+
+def test_async_calls_are_bounded_and_use_configured_model():
+    async def run(server):
+        client, generator = make_generator(server, max_concurrency=2)
+        async with client:
+            return await asyncio.gather(*(generator.generate_finding_description(FINDINGS) for _ in range(6)))
+
+    with FakeLLMServer(delay=0.1) as server:
+        results = asyncio.run(run(server))
+
+    assert results == ['Low RSSI dominates.'] * 6
+    assert server.max_in_flight == 2
+    path, body = server.requests[0]
+    assert path.startswith('/openai/deployments/test-deployment/chat/completions')
+    assert body['model'] == 'test-deployment'
+
+
+def test_slow_llm_call_times_out():
+    async def run(server):
+        client, generator = make_generator(server, timeout=0.2)
+        async with client:
+            await generator.generate_finding_description(FINDINGS)
+
+    with FakeLLMServer(delay=1.0) as server:
+        with pytest.raises(TimeoutError):
+            asyncio.run(run(server))
+
+
+def test_per_floor_analysis_shares_calls_and_respects_budget():
+    findings = pd.DataFrame({
+        'Floor': ['1st', '1st', '2nd', '2nd', '3rd', '4th'],
+        'Failure': ['Failed RSSI', 'Failed SNR', 'Failed SNR', 'Failed RSSI', 'Failed RSSI', 'Failed Roaming'],
+    })
+
+    async def run(server, token_budget):
+        client, generator = make_generator(server)
+        generator.per_floor = PerFloorAnalysisConfig(enabled=True, max_concurrency=2, token_budget=token_budget,
+                                                     time_budget_seconds=5, max_tokens_per_floor=100)
+        async with client:
+            return await generator.generate_findings_report(findings)
+
+    with FakeLLMServer() as server:
+        paragraphs = asyncio.run(run(server, token_budget=10000))
+    # 1st and 2nd have the same failure counts
+    assert len(server.requests) == 3
+    assert [paragraph.runs[0].text for paragraph in paragraphs] == ['1st, 2nd: ', '3rd: ', '4th: ']
+    assert all(body['max_tokens'] == 100 for _, body in server.requests)
+
+    with FakeLLMServer() as server:
+        paragraphs = asyncio.run(run(server, token_budget=300))
+    assert len(server.requests) == 1
+    assert paragraphs[-1].runs[1].text == '3rd, 4th'
+
+
+if __name__ == "__main__":
+    test_async_calls_are_bounded_and_use_configured_model()
+    test_slow_llm_call_times_out()
+    test_per_floor_analysis_shares_calls_and_respects_budget()
+    print("ok")
@@ -74,31 +74,13 @@ def test_build_doc():
     input_template_name = 'philips_scorecard/io/philips_scorecard_template.docx'
     ouput_template_name = 'philips_scorecard/io/updated_result.docx'
 
-    # Create a JSON object to simulate the input to the Azure. This file is relative to running the code in
-    # philips_scorecard and executing: python test/power_automate_simulator.py
-    #input_template_name = 'io/philips_scorecard_template.docx'
-    # Load the Word document template and convert to base64, just for testing.
-    document_content_base64 = word_to_base64(input_template_name)   
-
-    # Create the JSON object
-    json_data = {
-        "document_content": document_content_base64,
-        "form_row_id": 30
-    }     
-    # Convert the JSON object to a JSON string
-    json_request = json.dumps(json_data, indent=4)
+    # The in-process API takes the template bytes directly. Base64 and JSON are
+    # only used on the HTTP edge, see create_test_input for that request shape.
+    with open(input_template_name, "rb") as template_file:
+        document_content = template_file.read()
 
-    # Calling azure which sends back a json response, base64 encoded document
-    json_response = ScorecardGenerator().build_scorecard(json_request)
-
-    # Parse the JSON response
-    response_data = json.loads(json_response)
-
-    # Extract the 'content' field which is base64 encoded
-    document_content_modified_base64 = response_data['new_document_content']
-
-    # Decode the base64 content to get the binary data
-    document_content_modified = base64.b64decode(document_content_modified_base64)
+    # Calling the generator returns the .docx bytes
+    document_content_modified = ScorecardGenerator().build_scorecard_bytes(document_content, form_row_id=30)
 
     # Save the modified document to a new file. This is done locally for testing to verify the .docx is correct
     with open(ouput_template_name, "wb") as new_file:
@@ -106,7 +88,6 @@ def test_build_doc():
     print("Document saved to updated_result.docx")
 
 
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Power Automate Simulator")
     parser.add_argument("action", choices=["db_test", "create_input", "process_output", "build_doc"], help="Action to perform")
@@ -0,0 +1,58 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.utils.llm_client import estimate_tokens
+from philips_scorecard.utils.prompt_compaction import compact_summary, format_summary
+
+
+def test_near_duplicates_are_clustered_and_ranked():
+    summary = {
+        'Failed SNR': 4,
+        'Failed RSSI in 2006A': 3,
+        'Failed RSSI in 2010': 2,
+        'failed  RSSI in 1001.': 1,
+        'Coverage gap': 1,
+    }
+    assert compact_summary(summary) == {
+        'Failed RSSI in # (3 variants)': 6,
+        'Failed SNR': 4,
+        'Coverage gap': 1,
+    }
+    assert compact_summary(summary, top_k=1) == {
+        'Failed RSSI in # (3 variants)': 6,
+        'Other failures (2 types)': 5,
+    }
+
+
+def test_units_bands_and_channels_are_kept():
+    summary = {
+        'Primary RSSI below -67 dBm on 5GHz': 40,
+        'Primary RSSI below -67 dBm on 2.4GHz': 3,
+        'Co-channel interference on ch 36 near AP-12': 2,
+        'Co-channel interference on ch 36 near AP-14': 1,
+    }
+    assert compact_summary(summary) == {
+        'Primary RSSI below -67 dBm on 5GHz': 40,
+        'Primary RSSI below -67 dBm on 2.4GHz': 3,
+        'Co-channel interference on ch 36 near # (2 variants)': 3,
+    }
+
+
+def test_summary_fits_token_budget():
+    # Letters only, so no two failures cluster together
+    names = [chr(65 + i // 26) + chr(65 + i % 26) for i in range(300)]
+    summary = {f'Failure category {name} with a long description': i + 1 for i, name in enumerate(names)}
+    compacted = compact_summary(summary, top_k=50, token_budget=100)
+
+    assert estimate_tokens(format_summary(compacted)) <= 100
+    assert 1 < len(compacted) < 50
+    assert sum(compacted.values()) == sum(summary.values())
+
+
+if __name__ == "__main__":
+    test_near_duplicates_are_clustered_and_ranked()
+    test_units_bands_and_channels_are_kept()
+    test_summary_fits_token_budget()
+    print("ok")
@@ -1,20 +1,18 @@
 import asyncio
 import sys
 import os
-import json
-import base64
+import pytest
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from philips_scorecard.remediation_list_generator import *
-from philips_scorecard.utils.doc_converters import word_to_base64, excel_to_base64
 from philips_scorecard.config.config_loader import ConfigLoader
 
 async def test_remediation_list_generator():
     '''
     Test the remediation list generator
-    1. Load the word doc template file. This would be passed in as base64 in json
-    2. Load the excel file. This would be passed in as base64 in json
+    1. Load the word doc template file. Over HTTP this is a multipart upload or base64 in json
+    2. Load the excel file. Over HTTP this is a multipart upload or base64 in json
     3. Consolidate the results from the excel file (just pulling data, no manipulation)
     4. Call LLM to create it's report
     5. Replace placeholders in word doc with the table and llm report
@@ -26,31 +24,16 @@ async def test_remediation_list_generator():
     remediation_excel_filename = 'philips_scorecard/io/remediation_list_sample2.xlsx'
     remediation_output_filename = 'philips_scorecard/io/remediation_list_output.docx'
 
-    document_content_base64 = word_to_base64(input_template_name)
-    excel_content_base64 = excel_to_base64(remediation_excel_filename)
-
-    # Create the JSON object
-    json_data = {
-        "excel_content": excel_content_base64,
-        "output_template_content": document_content_base64
-    }     
-    # Convert the JSON object to a JSON string
-    json_request = json.dumps(json_data, indent=4)
+    with open(input_template_name, "rb") as template_file:
+        document_content = template_file.read()
+    with open(remediation_excel_filename, "rb") as excel_file:
+        excel_content = excel_file.read()
 
     azureOpenAI = ConfigLoader().initialize_openai_client()
 
     findings_document_generator = FindingsDocumentGenerator(azureOpenAI)
-    # Call the async function
-    json_response = await findings_document_generator.build_docx_output_in_json_format(json_request)
-
-    # Parse the JSON response
-    response_data = json.loads(json_response)
-
-    # Extract the 'content' field which is base64 encoded
-    document_content_modified_base64 = response_data['new_document_content']
-
-    # Decode the base64 content to get the binary data
-    document_content_modified = base64.b64decode(document_content_modified_base64)
+    # Call the async function, which takes and returns raw bytes
+    document_content_modified = await findings_document_generator.build_docx_output_bytes(excel_content, document_content)
 
     # Save the modified document to a new file. This is done locally for testing to verify the .docx is correct
     with open(remediation_output_filename, "wb") as new_file:
@@ -59,5 +42,45 @@ async def test_remediation_list_generator():
     print(f"Document saved to {remediation_output_filename}")
 
 
+def test_group_by_floor_counts_repeats_in_order():
+    df = pd.DataFrame({
+        'Floor': ['2nd', '1st', '2nd', '2nd'],
+        'Finding Details': ['F2.1 - Low RSSI', 'F1.1 - Low SNR', 'F2.2 - Roaming', 'F2.1 - Low RSSI'],
+        'Remediation Detail': ['Add AP', 'Move AP', 'Add AP', 'Add AP'],
+    })
+    table = FindingsDocumentGenerator(None).create_output_table_block(df)
+
+    # Header row, then floors in order of first appearance
+    floors = [[cell.runs[0].text for cell in row.cells] for row in table.rows[1:]]
+    assert floors == [['2nd', '2nd'], ['1st', '1st']]
+    assert table.rows[1].cells[0].bullets == ['F2.1 - Low RSSI (x2)', 'F2.2 - Roaming']
+    assert table.rows[1].cells[1].bullets == ['Add AP (x3)']
+
+
+def test_failed_rendering_cancels_the_analysis():
+    generator = FindingsDocumentGenerator(None)
+    cancelled = []
+
+    async def slow_report(df_remediations, bypass_cache):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append('analysis')
+            raise
+
+    def broken_render(template, df_remediations):
+        raise ValueError("table placeholder not found")
+
+    generator.load_remediations = lambda excel_content: pd.DataFrame({'Failure': ['Failed RSSI']})
+    generator.generate_findings_report = slow_report
+    generator.render_remediation_table = broken_render
+    with open('philips_scorecard/io/remediation_template.docx', 'rb') as template_file:
+        template_content = template_file.read()
+
+    with pytest.raises(ValueError, match="placeholder"):
+        asyncio.run(generator.build_docx_output_bytes(b'', template_content))
+    assert cancelled == ['analysis']
+
+
 if __name__ == '__main__':
     asyncio.run(test_remediation_list_generator())
\ No newline at end of file
@@ -0,0 +1,113 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.database.rules_cache import RulesCache, normalize_rules
+
+
+RULES = [
+    {'rule_no': 2, 'rule_id': 'BP_1_2', 'question': 'Second', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+    {'rule_no': None, 'rule_id': 'bp_9_9', 'question': 'Unnumbered', 'on_yes': 'PASS', 'on_no': 'FAIL'},
+    {'rule_no': 1, 'rule_id': 'bp_1_1', 'question': 'First', 'on_yes': 'FAIL', 'on_no': 'PASS'},
+]
+
+
+class RulesClient:
+    """Serves dbo.philips_rules and, optionally, dbo.philips_rule_decisions"""
+
+    def __init__(self, rules, decisions=None):
+        self.rules = rules
+        self.decisions = decisions
+        self.checksum = 'a1'
+        self.fail_decisions = False
+        self.queries = []
+
+    def fetch_records(self, query, params=None):
+        self.queries.append(query)
+        if 'OBJECT_ID' in query:
+            return [{'object_id': 1 if self.decisions is not None else None}]
+        if 'philips_rule_decisions' in query and self.fail_decisions:
+            raise Exception("connection reset")
+        if 'HASHBYTES' in query:
+            table = self.rules if 'philips_rules]' in query else self.decisions
+            return [{'row_count': len(table), 'checksum': self.checksum}]
+        if 'philips_rule_decisions' in query:
+            return self.decisions
+        return self.rules
+
+    def loads(self):
+        return sum(1 for query in self.queries if query.startswith('SELECT * FROM'))
+
+
+def test_rules_are_sorted_with_unnumbered_rules_last():
+    rules = normalize_rules(RULES)
+
+    assert [rule.rule_id for rule in rules] == ['bp_1_1', 'bp_1_2', 'bp_9_9']
+
+
+def test_rules_are_refetched_only_when_the_version_changes():
+    client = RulesClient(RULES)
+    cache = RulesCache(check_interval_seconds=0)
+
+    first = cache.get_compiled_rules(client)
+    assert cache.get_compiled_rules(client) is first
+    assert client.loads() == 1
+    # Without the decisions table the built-in defaults are used
+    assert first.decisions is None and first.version[2:] == (None, None)
+
+    client.checksum = 'b2'
+    assert cache.get_compiled_rules(client) is not first
+    assert client.loads() == 2
+    assert (cache.hits, cache.refreshes) == (1, 2)
+
+
+def test_version_check_is_skipped_within_the_interval():
+    client = RulesClient(RULES)
+    cache = RulesCache(check_interval_seconds=60)
+
+    cache.get_compiled_rules(client)
+    queries = len(client.queries)
+    client.checksum = 'b2'
+    cache.get_compiled_rules(client)
+
+    assert len(client.queries) == queries
+    cache.invalidate()
+    cache.get_compiled_rules(client)
+    assert cache.refreshes == 2
+
+
+def test_decisions_errors_are_raised_not_replaced_by_defaults():
+    client = RulesClient(RULES, decisions=[
+        {'rule_id': 'bp_1_1', 'answer': 'yes', 'justified': None, 'outcome': 'PASS'}
+    ])
+    cache = RulesCache(check_interval_seconds=0)
+    client.fail_decisions = True
+
+    with pytest.raises(Exception, match="connection reset"):
+        cache.get_compiled_rules(client)
+    assert cache.current() is None
+
+    client.fail_decisions = False
+    compiled = cache.get_compiled_rules(client)
+    assert compiled.decision_table.meets('bp_1_1', 0, 0)
+
+
+def test_snapshot_round_trip(tmp_path):
+    client = RulesClient(RULES)
+    cache = RulesCache(check_interval_seconds=0)
+    compiled = cache.get_compiled_rules(client)
+    path = tmp_path / 'rules_snapshot.json'
+    cache.save_snapshot(path)
+
+    warmed = RulesCache(check_interval_seconds=0, snapshot_path=path)
+    assert warmed.load_snapshot()
+    assert warmed.current().rules == compiled.rules
+    assert warmed.version == compiled.version
+
+    # The first request still confirms the version, and keeps the snapshot when it matches
+    assert warmed.get_compiled_rules(client) is warmed.current()
+    assert client.loads() == 1
+
+    assert not RulesCache(snapshot_path=tmp_path / 'missing.json').load_snapshot()
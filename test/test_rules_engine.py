@@ -0,0 +1,142 @@
+import sys
+import os
+import random
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.rules_engine import (
+    evaluate_rules, evaluate_submission, compile_decision_table, Rule, DECISION_COLUMNS
+)
+
+
+def reference_meets_requirements(form_data_df, rule):
+    '''
+    The original per-row rule evaluation from ScorecardGenerator.process_form_data,
+    kept verbatim as the oracle the vectorized engine has to match.
+    '''
+    rule_id = rule['rule_id']
+    answer = form_data_df[rule_id].iloc[0]
+    answer_lower = str(answer).lower()
+
+    justification_key = f"{rule_id}_justified"
+    has_justification = (justification_key in form_data_df.columns and
+                       str(form_data_df[justification_key].iloc[0]).lower() == 'yes')
+
+    if rule['rule_id'] == 'bp_4_3':
+        if answer_lower == 'yes':
+            meets_requirements = has_justification
+        else:
+            meets_requirements = True
+    elif rule['rule_id'] == 'bp_4_4':
+        if answer_lower == 'yes':
+            meets_requirements = False
+        else:
+            meets_requirements = True
+    elif rule['rule_id'] == 'bp_4_5':
+        if answer_lower == 'yes':
+            meets_requirements = True
+        else:
+            meets_requirements = has_justification
+    elif rule['rule_id'] == 'bp_8_3':
+        if answer_lower == 'yes':
+            meets_requirements = True
+        else:
+            meets_requirements = has_justification
+    elif rule['rule_id'] == 'bp_9_1':
+        if answer_lower == 'yes':
+            meets_requirements = True
+        else:
+            meets_requirements = has_justification
+    elif answer_lower == 'yes':
+        if justification_key in form_data_df.columns:
+            meets_requirements = has_justification
+        else:
+            meets_requirements = rule['on_yes'] == 'PASS'
+    elif answer_lower == 'no':
+        meets_requirements = rule['on_no'] == 'PASS'
+    else:
+        meets_requirements = True
+
+    return meets_requirements
+
+
+def make_rules():
+    rule_ids = ['p_1', 'p_2', 'bp_1_3', 'bp_4_3', 'bp_4_4', 'bp_4_5', 'bp_5_2',
+                'bp_8_3', 'bp_9_1', 'bp_9_2', 'bp_10_1', 'bp_missing']
+    on_yes = ['PASS', 'FAIL', 'FAIL', 'FAIL', 'PASS', 'PASS', 'FAIL', 'PASS', 'PASS', 'PASS', 'PASS', 'PASS']
+    on_no = ['FAIL', 'PASS', 'PASS', 'PASS', 'FAIL', 'FAIL', 'PASS', 'FAIL', 'FAIL', 'FAIL', None, 'FAIL']
+    return pd.DataFrame({
+        'rule_no': range(1, len(rule_ids) + 1),
+        'rule_id': rule_ids,
+        'on_yes': on_yes,
+        'on_no': on_no,
+    })
+
+
+def make_forms(count, seed=0):
+    rng = random.Random(seed)
+    values = ['Yes', 'No', 'yes', 'NO', 'N/A', '', None, np.nan, 1, 'Yes ']
+    columns = ['p_1', 'p_2', 'bp_1_3', 'bp_1_3_justified', 'bp_4_3', 'bp_4_3_justified',
+               'bp_4_4', 'bp_4_5', 'bp_5_2', 'bp_5_2_justified', 'bp_8_3', 'bp_8_3_justified',
+               'bp_9_1', 'bp_9_2', 'bp_9_2_justified', 'bp_10_1']
+    rows = [{column: rng.choice(values) for column in columns} for _ in range(count)]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_evaluate_rules_matches_reference():
+    rules_df = make_rules()
+    forms_df = make_forms(300)
+
+    meets_df = evaluate_rules(forms_df, rules_df)
+
+    assert list(meets_df.columns) == [r for r in rules_df['rule_id'] if r in forms_df.columns]
+    for i in range(len(forms_df)):
+        form_data_df = forms_df.iloc[[i]]
+        for rule in rules_df.to_dict('records'):
+            if rule['rule_id'] not in forms_df.columns:
+                continue
+            expected = reference_meets_requirements(form_data_df, rule)
+            assert meets_df.iloc[i][rule['rule_id']] == expected, (i, rule['rule_id'])
+
+
+def test_decision_rows_override_rule_columns():
+    rules_df = make_rules()
+    forms_df = pd.DataFrame({
+        'p_1': ['Yes', 'No', 'N/A'],
+        'bp_4_4': ['Yes', 'No', 'N/A'],
+    })
+    # p_1 now needs a justification that never comes, bp_4_4 drops its override
+    decisions_df = pd.DataFrame([
+        ('P_1', 'yes', 'no', 'FAIL'),
+        ('bp_4_4', 'yes', None, 'PASS'),
+        ('bp_4_4', 'other', None, 'FAIL'),
+    ], columns=DECISION_COLUMNS)
+
+    meets_df = evaluate_rules(forms_df, rules_df, compile_decision_table(rules_df, decisions_df))
+
+    assert meets_df['p_1'].tolist() == [False, False, True]
+    assert meets_df['bp_4_4'].tolist() == [True, False, False]
+
+
+def test_evaluate_submission_matches_dataframe_engine():
+    rules_df = make_rules()
+    forms_df = make_forms(100, seed=1)
+    rules = [Rule.from_record(rule) for rule in rules_df.to_dict('records')]
+    decision_table = compile_decision_table(rules)
+
+    meets_df = evaluate_rules(forms_df, rules_df)
+
+    for i, submission in enumerate(forms_df.to_dict('records')):
+        results = evaluate_submission(submission, rules, decision_table)
+        assert [result.id for result in results] == list(meets_df.columns)
+        assert [result.meets for result in results] == meets_df.iloc[i].tolist(), i
+        assert all(result.meets_requirements == ('Yes' if result.meets else 'No') for result in results)
+
+
+if __name__ == "__main__":
+    test_evaluate_rules_matches_reference()
+    test_decision_rows_override_rule_columns()
+    test_evaluate_submission_matches_dataframe_engine()
+    print("ok")
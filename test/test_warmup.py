@@ -0,0 +1,81 @@
+import sys
+import os
+import asyncio
+from docx import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from philips_scorecard.config.registry import ConfigRegistry
+from philips_scorecard.utils import llm_cache
+from philips_scorecard.utils.doc_converters import template_cache
+from philips_scorecard.warmup import warm_up_async
+
+
+CONFIG = '''
+db:
+  server: one.database.windows.net
+  database: wits
+llm:
+  endpoint: https://example.openai.azure.com
+  model: gpt-4
+  api_version: 2024-02-15-preview
+warmup:
+  template_paths:
+    - {template}
+    - {missing}
+  database: false
+llm_cache:
+  path: {cache}
+'''
+
+
+def use_fresh_llm_cache(monkeypatch):
+    """Let warmup create the process-wide LLM cache from the test's registry"""
+    monkeypatch.setattr(llm_cache, '_llm_cache', None)
+    monkeypatch.setattr(llm_cache, '_llm_cache_loaded', False)
+
+
+def test_warm_up_reports_every_step(tmp_path, monkeypatch):
+    monkeypatch.setenv('DB_USERNAME', 'scorecard')
+    monkeypatch.setenv('DB_PASSWORD', 'secret')
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'key')
+    template = tmp_path / 'template.docx'
+    Document().save(template)
+    config_path = tmp_path / 'config.yml'
+    config_path.write_text(CONFIG.format(template=template, missing=tmp_path / 'missing.docx',
+                                         cache=tmp_path / 'llm_cache.sqlite'))
+    registry = ConfigRegistry(config_path=config_path, env_path=tmp_path / '.env')
+    use_fresh_llm_cache(monkeypatch)
+
+    report = asyncio.run(warm_up_async(registry))
+    llm_cache.get_llm_cache().close()
+
+    steps = {step['name']: step for step in report['steps']}
+    assert list(steps) == ['import_scorecard', 'import_remediation', 'config', 'templates',
+                           'llm_cache', 'async_openai_client']
+    assert report['ok'], report
+    assert steps['templates']['detail'] == 'template.docx'
+    assert template_cache.stats()['entries'] >= 1
+    assert all(step['seconds'] >= 0 for step in report['steps'])
+    assert steps['llm_cache']['detail'] == '0 entries'
+    assert (tmp_path / 'llm_cache.sqlite').exists()
+
+
+def test_warm_up_continues_after_a_failed_step(tmp_path, monkeypatch):
+    monkeypatch.delenv('AZURE_OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('DB_USERNAME', 'scorecard')
+    monkeypatch.setenv('DB_PASSWORD', 'secret')
+    config_path = tmp_path / 'config.yml'
+    config_path.write_text(CONFIG.format(template=tmp_path / 'a.docx', missing=tmp_path / 'b.docx',
+                                         cache=tmp_path / 'llm_cache.sqlite'))
+    registry = ConfigRegistry(config_path=config_path, env_path=tmp_path / '.env')
+    use_fresh_llm_cache(monkeypatch)
+
+    report = asyncio.run(warm_up_async(registry))
+    llm_cache.get_llm_cache().close()
+
+    steps = {step['name']: step for step in report['steps']}
+    assert not report['ok']
+    assert not steps['async_openai_client']['ok']
+    assert 'API key' in steps['async_openai_client']['detail']
+    assert steps['llm_cache']['ok']